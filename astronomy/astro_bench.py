@@ -0,0 +1,150 @@
+# astro_bench.py Benchmark and accuracy regression test for sun_moon and moonphase
+
+# Copyright (c) Peter Hinch 2023
+# Released under the MIT license (see LICENSE)
+
+# Times RiSet.set_day, RiSet.rise_set and MoonPhase._populate over a range of
+# dates and sites, and compares results with reference values in astro_ref.json.
+# RiSet is run with floating point and with fixed point (sun_moon_fixed.py)
+# altitude curves.
+# Results are printed as JSON, one object per line.
+# On PC in astronomy directory:
+# python3 astro_bench.py  # Run tests
+# python3 astro_bench.py --ref  # Regenerate astro_ref.json (64-bit platform only)
+# On mip-installed host:
+# import sched.astro_bench
+# sched.astro_bench.run()
+
+try:
+    from .sun_moon import RiSet
+    from .moonphase import MoonPhase
+except ImportError:  # Running on PC in astronomy directory
+    from sun_moon import RiSet
+    from moonphase import MoonPhase
+import json
+import time
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:  # CPython
+    from time import perf_counter
+
+    def ticks_us():
+        return round(perf_counter() * 1_000_000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+SITES = (  # Name, lat, long, lto, tl
+    ("UK", 53.29756504536339, -2.102811634540558, 0, None),
+    ("Seattle", 47.61, -122.35, -8, 6),
+    ("Sydney", -33.86, 151.21, 11, 12),
+    ("Tromso", 69.65, 18.96, 1, 18),
+)
+START = 19695  # 4th Dec 2023 in days since Unix epoch
+NDAYS = 52
+STEP = 7  # One year at weekly intervals
+# Tolerances in secs. 64-bit platforms produce exact results.
+RISET_TOL = 30
+FIXED_TOL = 60  # Fixed point is compared with the same (floating point) reference
+PHASE_TOL = 60
+# Unix epoch in secs since machine epoch
+EPOCH = -946684800 if time.gmtime(0)[0] == 2000 else 0
+_fname = __file__.rsplit("/", 1)[0] + "/astro_ref.json" if "/" in __file__ else "astro_ref.json"
+
+
+def emit(**kwargs):
+    print(json.dumps(kwargs))
+
+
+# Return a list of lists of rise and set times, one per date. Emit timings.
+def riset(name, lat, long, lto, tl, fixed=False):
+    RiSet.set_time(START * 86400)
+    rs = RiSet(lat, long, lto, tl, fixed=fixed)
+    mode = "fixed" if fixed else "float"
+    res = []
+    dt = 0
+    for day in range(START, START + NDAYS * STEP, STEP):
+        RiSet.set_time(day * 86400)
+        t = ticks_us()
+        rs.set_day()
+        dt += ticks_diff(ticks_us(), t)
+        res.append(list(rs._times))
+    emit(test="RiSet.set_day", site=name, mode=mode, us_per_call=dt / NDAYS)
+    dt = 0
+    for sun in (True, False):
+        rs._ys.clear()  # Force calculation of altitudes
+        t = ticks_us()
+        rs.rise_set(sun, False)
+        dt += ticks_diff(ticks_us(), t)
+    emit(test="RiSet.rise_set", site=name, mode=mode, us_per_call=dt / 2)
+    return res
+
+
+# Return the five quarter times, as secs since Unix epoch, for each date.
+def phases():
+    MoonPhase.verbose = False
+    mp = MoonPhase()
+    res = []
+    dt = 0
+    for day in range(START, START + NDAYS * STEP, STEP):
+        mp.phases[0] = mp.phases[4] = 0  # Force calculation
+        t = ticks_us()
+        mp._populate(day * 86400 + EPOCH)
+        dt += ticks_diff(ticks_us(), t)
+        res.append([p - EPOCH for p in mp.phases])
+    emit(test="MoonPhase._populate", us_per_call=dt / NDAYS)
+    return res
+
+
+def compare(test, result, ref, tol):
+    maxerr = 0
+    errors = 0
+    for row, refrow in zip(result, ref):
+        for act, req in zip(row, refrow):
+            if (act is None) != (req is None):
+                errors += 1  # Presence of event differs
+            elif act is not None:
+                maxerr = max(maxerr, abs(act - req))
+    passed = errors == 0 and maxerr <= tol
+    emit(test=test, max_error=maxerr, missing=errors, tolerance=tol, passed=passed)
+    return passed
+
+
+def run(ref=False):
+    RiSet.verbose = False
+    size = RiSet.cache_size
+    RiSet.cache_size = 0  # Measure calculation, not cache retrieval
+    RiSet.cache_clear()
+    results = {}
+    try:
+        for site in SITES:
+            results[site[0]] = riset(*site)
+        if not ref:
+            for site in SITES:
+                results[f"{site[0]} fixed"] = riset(*site, fixed=True)
+        results["phases"] = phases()
+    finally:
+        RiSet.cache_size = size
+        RiSet.tim = None
+    if ref:
+        with open(_fname, "w") as f:
+            json.dump(results, f)
+        emit(test="reference", file=_fname)
+        return True
+    with open(_fname, "r") as f:
+        reference = json.load(f)
+    passed = True
+    for site in SITES:
+        passed &= compare(f"RiSet {site[0]}", results[site[0]], reference[site[0]], RISET_TOL)
+        passed &= compare(f"RiSet {site[0]} fixed", results[f"{site[0]} fixed"], reference[site[0]], FIXED_TOL)
+    passed &= compare("MoonPhase", results["phases"], reference["phases"], PHASE_TOL)
+    emit(test="summary", passed=passed)
+    return passed
+
+
+if __name__ == "__main__":
+    import sys
+
+    run("--ref" in sys.argv)
@@ -0,0 +1,93 @@
+# chebyshev.py Chebyshev polynomial ephemerides for sun_moon.py
+
+# Copyright (c) Peter Hinch 2023
+# Released under the MIT license (see LICENSE)
+
+# minisun and minimoon evaluate trigonometric series: minimoon makes around 25
+# calls to sin() or cos(). These are costly on platforms with software floating
+# point. This module fits Chebyshev polynomials to their x, y, z outputs over a
+# span of dates. Evaluation uses only multiply-adds.
+
+# Tables may be generated on a PC and written out as a Python module: if this is
+# frozen as bytecode the coefficients occupy no RAM.
+# Usage:
+# from sched.sun_moon import RiSet, minisun, minimoon, get_mjd
+# from sched.chebyshev import fit
+# mjd = get_mjd()  # Today
+# sun = fit(minisun, mjd - 1, 366, 32, 8)
+# moon = fit(minimoon, mjd - 1, 366, 8, 8)
+# rs = RiSet(ephem=(sun, moon))
+
+from array import array
+from math import cos, pi
+
+
+class Chebyshev:
+    # mjd0: MJD of start of table. span: days covered by each segment. degree:
+    # of polynomials. coeffs: array("f") of coefficients. For each segment
+    # these are (degree + 1) values for x, followed by those for y and z.
+    # func: optional series function used for dates outside the table.
+    def __init__(self, mjd0, span, degree, coeffs, func=None):
+        self.mjd0 = mjd0
+        self.span = span
+        self.degree = degree
+        self.coeffs = coeffs
+        self.func = func
+        self.nsegs = len(coeffs) // (3 * (degree + 1))
+
+    # Takes t centuries since J2000.0 and returns x, y, z as per minisun.
+    def __call__(self, t):
+        d = t * 36525 + (51544.5 - self.mjd0)  # Days since start of table
+        span = self.span
+        seg = int(d // span)
+        if not 0 <= seg < self.nsegs:
+            if self.func is None:
+                raise ValueError("Date is outside Chebyshev table.")
+            return self.func(t)
+        x2 = 2 * (2 * (d - seg * span) / span - 1)  # Map segment onto [-1, 1]: x2 = 2x
+        c = self.coeffs
+        n = self.degree + 1
+        j = n * (3 * seg + 1)  # Index of y coefficient 0. x and z are offset by -n, +n
+        bx = by = bz = 0.0
+        bx2 = by2 = bz2 = 0.0
+        for i in range(j + n - 1, j, -1):  # Clenshaw recurrence for x, y, z in one loop
+            bx, bx2 = x2 * bx - bx2 + c[i - n], bx
+            by, by2 = x2 * by - by2 + c[i], by
+            bz, bz2 = x2 * bz - bz2 + c[i + n], bz
+        x2 *= 0.5
+        return x2 * bx - bx2 + c[j - n], x2 * by - by2 + c[j], x2 * bz - bz2 + c[j + n]
+
+    # Write the table out as a Python module. Import the module and pass
+    # .table to the Chebyshev constructor: Chebyshev(*mod.table, func=minimoon)
+    def write(self, fname):
+        with open(fname, "w") as f:
+            f.write("# Chebyshev ephemeris generated by chebyshev.py\n")
+            f.write("from array import array\n\n")
+            f.write(f"table = ({self.mjd0}, {self.span}, {self.degree}, array('f', (\n")
+            c = self.coeffs
+            for n in range(0, len(c), 6):
+                f.write("    ")
+                f.write(" ".join(f"{v!r}," for v in c[n : n + 6]))
+                f.write("\n")
+            f.write(")))\n")
+
+
+# Fit polynomials to a series function (minisun or minimoon) over ndays from
+# mjd0. Each segment is interpolated at the Chebyshev nodes. The function is
+# retained to handle dates outside the table.
+def fit(func, mjd0, ndays, span, degree):
+    n = degree + 1
+    nsegs = -(-ndays // span)  # Round up
+    coeffs = array("f", (0 for _ in range(3 * n * nsegs)))
+    nodes = [cos(pi * (k + 0.5) / n) for k in range(n)]
+    for seg in range(nsegs):
+        mid = mjd0 + (seg + 0.5) * span - 51544.5
+        vals = [func((mid + 0.5 * span * x) / 36525) for x in nodes]
+        for axis in range(3):
+            base = (3 * seg + axis) * n
+            for j in range(n):
+                s = 0
+                for k in range(n):
+                    s += vals[k][axis] * cos(pi * j * (k + 0.5) / n)
+                coeffs[base + j] = s * 2 / n if j else s / n
+    return Chebyshev(mjd0, span, degree, coeffs, func)
@@ -15,6 +15,7 @@
 from math import radians, sin, cos, floor
 import time
 import array
+import struct
 
 SYNMONTH = 29.53058868  # Synodic month (new Moon to new Moon)
 
@@ -46,45 +47,67 @@ def truephase(k: int, phi: int) -> int:
     t2 = t * t  # Square for frequent use
     t3 = t2 * t  # Cube for frequent use
     # Sun's mean anomaly
-    m = 359.2242 + 29.10535608 * k - 0.0000333 * t2 - 0.00000347 * t3
+    m = radians(359.2242 + 29.10535608 * k - 0.0000333 * t2 - 0.00000347 * t3)
     # Moon's mean anomaly
-    mprime = 306.0253 + 385.81691806 * k + 0.0107306 * t2 + 0.00001236 * t3
+    mprime = radians(306.0253 + 385.81691806 * k + 0.0107306 * t2 + 0.00001236 * t3)
     # Moon's argument of latitude
-    f = 21.2964 + 390.67050646 * k - 0.0016528 * t2 - 0.00000239 * t3
+    f = radians(21.2964 + 390.67050646 * k - 0.0016528 * t2 - 0.00000239 * t3)
+    # Sines and cosines of the three angles are evaluated once. Those of
+    # multiples and combinations follow from angle addition identities.
+    sm = sin(m)
+    cm = cos(m)
+    sp = sin(mprime)
+    cp = cos(mprime)
+    sf = sin(f)
+    cf = cos(f)
+    s2m = 2 * sm * cm  # sin(2 * m)
+    c2m = cm * cm - sm * sm
+    s2p = 2 * sp * cp  # sin(2 * mprime)
+    c2p = cp * cp - sp * sp
+    s2f = 2 * sf * cf  # sin(2 * f)
+    c2f = cf * cf - sf * sf
+    s3p = s2p * cp + c2p * sp  # sin(3 * mprime)
+    smpp = sm * cp + cm * sp  # sin(m + mprime)
+    smmp = sm * cp - cm * sp  # sin(m - mprime)
+    sfpm = s2f * cm + c2f * sm  # sin(2 * f + m)
+    sfmm = s2f * cm - c2f * sm  # sin(2 * f - m)
+    sfpp = s2f * cp + c2f * sp  # sin(2 * f + mprime)
+    sfmp = s2f * cp - c2f * sp  # sin(2 * f - mprime)
+    smp2 = sm * c2p + cm * s2p  # sin(m + 2 * mprime)
     if phi in (0, 2):  # Corrections for New and Full Moon
-        pt = (0.1734 - 0.000393 * t) * sin(radians(m))
-        pt += 0.0021 * sin(radians(2 * m))
-        pt -= 0.4068 * sin(radians(mprime))
-        pt += 0.0161 * sin(radians(2 * mprime))
-        pt -= 0.0004 * sin(radians(3 * mprime))
-        pt += 0.0104 * sin(radians(2 * f))
-        pt -= 0.0051 * sin(radians(m + mprime))
-        pt -= 0.0074 * sin(radians(m - mprime))
-        pt += 0.0004 * sin(radians(2 * f + m))
-        pt -= 0.0004 * sin(radians(2 * f - m))
-        pt -= 0.0006 * sin(radians(2 * f + mprime))
-        pt += 0.0010 * sin(radians(2 * f - mprime))
-        pt += 0.0005 * sin(radians(m + 2 * mprime))
+        pt = (0.1734 - 0.000393 * t) * sm
+        pt += 0.0021 * s2m
+        pt -= 0.4068 * sp
+        pt += 0.0161 * s2p
+        pt -= 0.0004 * s3p
+        pt += 0.0104 * s2f
+        pt -= 0.0051 * smpp
+        pt -= 0.0074 * smmp
+        pt += 0.0004 * sfpm
+        pt -= 0.0004 * sfmm
+        pt -= 0.0006 * sfpp
+        pt += 0.0010 * sfmp
+        pt += 0.0005 * smp2
     else:  # First or last quarter
-        pt = (0.1721 - 0.0004 * t) * sin(radians(m))
-        pt += 0.0021 * sin(radians(2 * m))
-        pt -= 0.6280 * sin(radians(mprime))
-        pt += 0.0089 * sin(radians(2 * mprime))
-        pt -= 0.0004 * sin(radians(3 * mprime))
-        pt += 0.0079 * sin(radians(2 * f))
-        pt -= 0.0119 * sin(radians(m + mprime))
-        pt -= 0.0047 * sin(radians(m - mprime))
-        pt += 0.0003 * sin(radians(2 * f + m))
-        pt -= 0.0004 * sin(radians(2 * f - m))
-        pt -= 0.0006 * sin(radians(2 * f + mprime))
-        pt += 0.0021 * sin(radians(2 * f - mprime))
-        pt += 0.0003 * sin(radians(m + 2 * mprime))
-        pt += 0.0004 * sin(radians(m - 2 * mprime))
-        pt -= 0.0003 * sin(radians(2 * m + mprime))
+        pt = (0.1721 - 0.0004 * t) * sm
+        pt += 0.0021 * s2m
+        pt -= 0.6280 * sp
+        pt += 0.0089 * s2p
+        pt -= 0.0004 * s3p
+        pt += 0.0079 * s2f
+        pt -= 0.0119 * smpp
+        pt -= 0.0047 * smmp
+        pt += 0.0003 * sfpm
+        pt -= 0.0004 * sfmm
+        pt -= 0.0006 * sfpp
+        pt += 0.0021 * sfmp
+        pt += 0.0003 * smp2
+        pt += 0.0004 * (sm * c2p - cm * s2p)  # sin(m - 2 * mprime)
+        pt -= 0.0003 * (s2m * cp + c2m * sp)  # sin(2 * m + mprime)
         if phi < 2:  # First quarter correction
-            pt += 0.0028 - 0.0004 * cos(radians(m)) + 0.0003 * cos(radians(mprime))
+            pt += 0.0028 - 0.0004 * cm + 0.0003 * cp
         else:  # Last quarter correction
-            pt += -0.0028 + 0.0004 * cos(radians(m)) - 0.0003 * cos(radians(mprime))
+            pt += -0.0028 + 0.0004 * cm - 0.0003 * cp
     pt = round(pt * 86400)  # Integer seconds from here
     pt += round(2_953_058_868 * 864 * k) // 1000_000  # round(SYNMONTH * k * 86400)
     qq = 0.0001178 * t2 - 0.000000155 * t3
@@ -93,6 +116,34 @@ def truephase(k: int, phi: int) -> int:
     return pt + 208_657_793_606
 
 
+# A moon phase index is a file holding precomputed truephase results. Header:
+# b"MPHI", first lunation number, number of lunations. This is followed by an
+# array("q") of quarter times in Julian seconds, four per lunation plus the new
+# moon ending the last one. Times are independent of the platform epoch.
+INDEX = "<4sqi"
+
+
+# Write an index covering nyears from the start of year.
+def write_index(fname: str, year: int, nyears: int):
+    k0 = floor((year - 1900) * 12.3685) - 1  # Lunation number
+    n = int(nyears * 12.3685) + 3
+    q = array.array("q", (truephase(k0 + i // 4, i % 4) for i in range(4 * n + 1)))
+    with open(fname, "wb") as f:
+        f.write(struct.pack(INDEX, b"MPHI", k0, n))
+        f.write(q)
+
+
+# Return the first lunation number and the array of quarter times.
+def read_index(fname: str):
+    with open(fname, "rb") as f:
+        magic, k0, n = struct.unpack(INDEX, f.read(struct.calcsize(INDEX)))
+        if magic != b"MPHI":
+            raise ValueError("Not a moon phase index.")
+        q = array.array("q", (0 for _ in range(4 * n + 1)))
+        f.readinto(q)
+    return k0, q
+
+
 def dt_to_text(tim):  # Convert a time to text
     t = time.localtime(tim)
     return f"{t[2]:02}/{t[1]:02}/{t[0]:4} {t[3]:02}:{t[4]:02}:{t[5]:02}"
@@ -101,7 +152,7 @@ def dt_to_text(tim):  # Convert a time to text
 class MoonPhase:
     verbose = True
 
-    def __init__(self, lto: float = 0, dst=lambda x: x):
+    def __init__(self, lto: float = 0, dst=lambda x: x, index=None):
         self.lto_s = self._check_lto(lto)  # -15 < lto < 15
         # local time = UTC + lto .lto_s = offset in secs
         self.dst = dst
@@ -116,6 +167,8 @@ class MoonPhase:
         jepoch *= 864  # Seconds from epoch
         self.jepoch = jepoch
         self.secs = 0  # Time of calling .set_day in secs UTC
+        self.lunation = 0  # Lunation number of .phases
+        self.index = None if index is None else read_index(index)  # (k0, array)
         self.set_day()  # Populate array and .secs
         if MoonPhase.verbose:
             print(f"Machine time: {dt_to_text(time.time())}")
@@ -167,8 +220,9 @@ class MoonPhase:
             r = (n - 1) * 0.25 + (t - prev) * 0.25 / (phi - prev)
         return min(r, 0.999999)  # Rare pathological results where r slightly > 1.0
 
-    def _next_lunation(self):  # Use approx time of next full moon to advance
-        self._populate(round(self.phases[2] + SYNMONTH * 86400))
+    def _next_lunation(self):  # Reuse the new moon ending the current lunation
+        self.phases[0] = self.phases[4]
+        self._fill(self.lunation + 1, 1)
 
     # toff: days offset with optional fraction
     def nextphase(self, text: bool = True):
@@ -196,33 +250,33 @@ class MoonPhase:
     def _populate(self, t: int):
         if self.phases[0] < t < self.phases[4]:
             return  # Nothing to do
-        # Return days since Jan 0.5 1900 as a float. Returns same value on 32 and 64 bits
-        def jd1900(t: int) -> float:
-            y, m, mday = time.localtime(t)[:3]
-            if m <= 2:
-                m += 12
-                y -= 1
-            b = round(y / 400 - y / 100 + y / 4)
-            mjm = 365 * y - 679004 + b + int(30.6001 * (m + 1)) + mday
-            return mjm - 15019.5
-
-        sdate: float = jd1900(t)  # Days since 1900 January 0.5
-        adate: float = sdate - 45
-        yy, mm, dd = time.localtime(t)[:3]
-        k1: int = floor((yy + ((mm - 1) * (1.0 / 12.0)) - 1900) * 12.3685)  # 365.25/SYNMONTH
-        adate = meanphase(adate, k1)  # Find new moon well before current date
-        nt1: float = adate
-        while True:
-            adate += SYNMONTH  # For each lunar month
-            k2: int = k1 + 1
-            nt2: float = meanphase(adate, k2)
-            if nt1 <= sdate and nt2 > sdate:
-                break
-            nt1 = nt2
-            k1 = k2
-        # k is integer days since start of 1900, being the lunation number
-        # 1533, 1534 on both platforms.
-        for n, k in enumerate((k1, k1, k1, k1, k2)):
-            phi: int = truephase(k, n % 4)  # Args lunation no., phase no. 0..3
+        # Days since 1900 January 0.5 of 00:00 UTC on the day containing t.
+        # 207_360_043_200 is MJD 0 (JD 2400000.5) in Julian seconds.
+        sdate: float = (t + self.jepoch - 207_360_043_200) // 86400 - 15019.5
+        # Find the lunation k whose mean new moon precedes sdate: direct estimate
+        # can be out by one owing to the small terms in meanphase.
+        k: int = floor((sdate - 0.75933) / SYNMONTH)
+        if meanphase(sdate, k) > sdate:
+            k -= 1
+        elif meanphase(sdate, k + 1) <= sdate:
+            k += 1
+        self._fill(k)
+
+    # Calculate phases from index start for lunation k. k is the lunation number
+    # counting from 1900 January 0.5: 1533, 1534 for Dec 2023 on both platforms.
+    # If the lunation is in the index, values are copied from it.
+    def _fill(self, k: int, start: int = 0):
+        i = -1  # Offset of lunation in index
+        if self.index is not None:
+            k0, q = self.index
+            i = 4 * (k - k0)
+            if i + 4 >= len(q):
+                i = -1
+        for n in range(start, 5):
+            if i < 0:
+                phi: int = truephase(k + n // 4, n % 4)  # Args lunation no., phase no. 0..3
+            else:
+                phi = q[i + n]
             self.phases[n] = phi - self.jepoch  # Julian datetime to secs since hardware epoch
             # Datetimes in secs since hardware epoch based on UTC
+        self.lunation = k
@@ -15,11 +15,21 @@
 # Moon phase now in separate module
 
 import time
-from math import sin, cos, sqrt, fabs, atan, radians, floor, pi
+import struct
+from array import array
+from math import sin, cos, sqrt, fabs, atan, atan2, asin, radians, degrees, floor, pi
 
 LAT = 53.29756504536339  # Local defaults
 LONG = -2.102811634540558
 
+NOEVENT = -1  # Value stored in .calendar() columns where there is no event
+EVENTS = ("sunrise", "sunset", "moonrise", "moonset", "tstart", "tend")  # ._times order
+# Table file header: b"RSET", sin(lat), long, sin(tl) (2.0 if None), lto secs,
+# first MJD, no. of days. Followed by six array("i") values per day.
+TABLE = "<4sdddiii"
+SINHO_SUN = sin(radians(-0.833))  # Sunset upper limb simple refraction
+SINHO_MOON = sin(radians(8 / 60))  # Moonrise taken as centre of moon at +8 arcmin
+
 # MicroPython wanton epochs:
 # time.gmtime(0)[0] = 1970 or 2000 depending on platform.
 # On CPython:
@@ -48,6 +58,9 @@ def quad(ym, yz, yp):
     a = 0.5 * (ym + yp) - yz
     b = 0.5 * (yp - ym)
     c = yz
+    if a == 0:  # Straight line: three collinear samples
+        z1 = -c / b if b else 2.0
+        return (1, z1, z1, c) if fabs(z1) <= 1.0 else (0, 0, 0, 0)
     xe = -b / (2 * a)
     ye = (a * xe + b) * xe + c
     dis = b * b - 4.0 * a * c  # discriminant of y=a*x^2 +bx +c
@@ -93,7 +106,44 @@ def to_int(x):
     return None if x is None else round(x)
 
 
-def minisun(t):
+# Given a function returning sin(alt) - sinho at integer hours 0..24 find rise
+# and set times in secs from midnight. The loop finds the sin(alt) for sets of
+# three consecutive hours, and then tests for a single zero crossing in the
+# interval or for two zero crossings in an interval for for a grazing event.
+def crossings(f):
+    t_rise = None  # Rise and set times in secs from midnight
+    t_set = None
+    yp = f(0)
+    for hour in range(1, 24, 2):
+        ym = yp
+        yz = f(hour)
+        yp = f(hour + 1)
+        nz, z1, z2, ye = quad(ym, yz, yp)  # Find horizon crossings
+        if nz == 1:  # One crossing found
+            if ym < 0.0:
+                t_rise = 3600 * (hour + z1)
+            else:
+                t_set = 3600 * (hour + z1)
+        # case where two events are found in this interval
+        # (rare but whole reason we are not using simple iteration)
+        elif nz == 2:
+            if z2 < z1:  # z1 is closer to zero so may be the later root
+                z1, z2 = z2, z1
+            if ye < 0.0:
+                t_rise = 3600 * (hour + z2)
+                t_set = 3600 * (hour + z1)
+            else:
+                t_rise = 3600 * (hour + z1)
+                t_set = 3600 * (hour + z2)
+
+        if t_rise is not None and t_set is not None:
+            break  # All done
+    return to_int(t_rise), to_int(t_set)  # Convert to int preserving None values
+
+
+# minisun and minimoon accept sin and cos as args so that the batch code can
+# pass NumPy ufuncs and evaluate many times in one call.
+def minisun(t, sin=sin, cos=cos):
     # Output sin(dec), cos(dec), ra
     # returns the ra and dec of the Sun
     # in decimal hours, degs referred to the equinox of date and using
@@ -115,7 +165,7 @@ def minisun(t):
     return x, y, z
 
 
-def minimoon(t):
+def minimoon(t, sin=sin, cos=cos):
     # takes t and returns the geocentric ra and dec
     # claimed good to 5' (angle) in ra and 1' in dec
     # tallies with another approximate method and with ICE for a couple of dates
@@ -173,23 +223,84 @@ def minimoon(t):
     return x, y, z
 
 
+# See https://github.com/orgs/micropython/discussions/13075
+def lstt(t, h):
+    # Takes the mjd and the longitude (west negative) and then returns
+    # the local sidereal time in degrees. Im using Meeus formula 11.4
+    # instead of messing about with UTo and so on
+    # modified to use the pre-computed 't' value from sin_alt
+    d = t * 36525
+    df = frac(0.5 + h / 24)
+    c1 = 360
+    c2 = 0.98564736629
+    dsum = c1 * df + c2 * d  # dsum is still ~ 9000 on average, losing precision
+    lst = 280.46061837 + dsum + t * t * (0.000387933 - t / 38710000)
+    return lst
+
+
+# Vectorised evaluation of raw rise and set times for ndays consecutive MJDs
+# using NumPy (CPython only). Returns a dict keyed by MJD, empty if NumPy is not
+# installed or if the RiSet uses other ephemerides or fixed point. Results match
+# RiSet._raw.
+def _np_raw(rs, mjd, ndays):
+    if rs.ephem != (minisun, minimoon) or rs._curve is not None:
+        return {}
+    try:
+        import numpy as np
+    except ImportError:
+        return {}
+    hour = np.arange(25.0)
+    t = ((np.arange(mjd, mjd + ndays)[:, None] - 51544.5) + hour / 24.0) / 36525.0
+    tl = np.radians(lstt(t, hour) + rs.long)  # Local sidereal time
+    ctl = np.cos(tl)
+    stl = np.sin(tl)
+    ys = []  # sin(alt) for sun and moon: one row of 25 hourly values per day
+    for func in (minisun, minimoon):
+        x, y, z = func(t, np.sin, np.cos)
+        ys.append((rs.sglat * z + rs.cglat * (x * ctl + y * stl)).tolist())
+    res = {}
+    for n, (sun, moon) in enumerate(zip(*ys)):
+        sr, ss = crossings(lambda hour: sun[hour] - SINHO_SUN)
+        tr = None
+        ts = None
+        if rs.tlight is not None:
+            tr, ts = crossings(lambda hour: sun[hour] + rs.tlight)
+        mr, ms = crossings(lambda hour: moon[hour] - SINHO_MOON)
+        res[mjd + n] = (sr, ss, mr, ms, tr, ts)
+    return res
+
+
 class RiSet:
     verbose = True
     # Riset.mtime() returns machine time as an int. The class variable tim is for
     # test purposes only and allows the hardware clock to be overridden
     tim = None
+    # LRU cache of ._times shared by all instances. Keys comprise MJD, location,
+    # LTO, twilight and dst function. Setting cache_size = 0 disables caching.
+    cache_size = 16
+    hits = 0
+    misses = 0
+    _cache = {}
+    _lru = []  # Cache keys, least recently used first
 
     @classmethod
     def mtime(cls):
         return round(time.time()) if cls.tim is None else cls.tim
 
+    @classmethod
+    def cache_clear(cls):
+        cls._cache.clear()
+        cls._lru.clear()
+        cls.hits = 0
+        cls.misses = 0
+
     @classmethod
     def set_time(cls, t):  # Given time from Unix epoch set time
         if time.gmtime(0)[0] == 2000:  # Machine epoch
             t -= 10957 * 86400
         cls.tim = t
 
-    def __init__(self, lat=LAT, long=LONG, lto=0, tl=None, dst=lambda x: x):  # Local defaults
+    def __init__(self, lat=LAT, long=LONG, lto=0, tl=None, dst=lambda x: x, ephem=(minisun, minimoon), table=None, fixed=False):
         self.sglat = sin(radians(lat))
         self.cglat = cos(radians(lat))
         self.long = long
@@ -197,10 +308,21 @@ class RiSet:
         self.lto = round(lto * 3600)  # Localtime offset in secs
         self.tlight = sin(radians(tl)) if tl is not None else tl
         self.dst = dst
+        self.ephem = ephem  # Functions returning sun and moon x, y, z. See chebyshev.py
+        self._curve = None  # Fixed point altitude curves. See sun_moon_fixed.py
+        if fixed:
+            try:
+                from .sun_moon_fixed import Curve
+            except ImportError:  # Running on PC in astronomy directory
+                from sun_moon_fixed import Curve
+            self._curve = Curve
         self.mjd = None  # Current integer MJD
         # Times in integer secs from midnight on current day (in machine time adjusted for DST)
         # [sunrise, sunset, moonrise, moonset, cvend, cvstart]
         self._times = [None] * 6
+        # Hourly sin(alt) samples keyed by (mjd, sun). See ._samples()
+        self._ys = {}
+        self._table = None if table is None else self._open_table(table)  # (fname, mjd0, ndays)
         self.set_day()  # Initialise to today's date
         if RiSet.verbose:
             t = time.localtime()
@@ -240,6 +362,111 @@ class RiSet:
     def tend(self, variant: int = 0):
         return self._format(self._times[5], variant)
 
+    # Batch calculation for ndays consecutive days starting at day offset day.
+    # Returns a tuple of six array("i") columns in ._times order, each holding
+    # secs since 00:00:00 localtime or NOEVENT. Adjacent days share results for
+    # the Julian days they have in common. The instance's own date is unchanged.
+    def calendar(self, day: int = 0, ndays: int = 365, vectorise: bool = True):
+        mjd0 = get_mjd(day)
+        days = self._days()
+        mjd, times = self.mjd, self._times  # Restored on exit
+        # Raw UTC times keyed by MJD. Precalculated if NumPy is available.
+        raw = _np_raw(self, mjd0 + days[0] - 1, ndays + len(days) - 1) if vectorise else {}
+        cols = tuple(array("i", (NOEVENT for _ in range(ndays))) for _ in range(6))
+        try:
+            for n in range(ndays):
+                self._times = [None] * 6
+                for day in days:
+                    m = mjd0 + n + day - 1
+                    if m not in raw:
+                        raw[m] = self._raw(m)
+                    self.adjust(raw[m], day)
+                raw.pop(mjd0 + n + days[0] - 1)  # No longer required
+                for col, t in zip(cols, self._times):
+                    if t is not None:
+                        col[n] = t
+        finally:
+            self.mjd, self._times = mjd, times
+        return cols
+
+    # Times when the sun crosses each of a sequence of altitudes in degrees, e.g.
+    # (-18, -12, -6, -0.833, 6). Returns a list of (rise, set) pairs. One set of
+    # hourly samples serves all thresholds and is shared with .sunrise() etc.
+    def altitudes(self, alts, variant: int = 0):
+        res = [None] * (2 * len(alts))
+        mjd = self.mjd
+        sinhos = [sin(radians(a)) for a in alts]
+        for day in self._days():
+            self.mjd = mjd + day - 1
+            ys = self._samples(True)
+            times = []
+            for sinho in sinhos:
+                times.extend(crossings(lambda hour: self._sample(ys, hour, True) - sinho))
+            self.adjust(times, day, res)
+        self.mjd = mjd
+        return [(self._format(res[n], variant), self._format(res[n + 1], variant)) for n in range(0, len(res), 2)]
+
+    # Sun azimuth and elevation in degrees at secs since 00:00:00 localtime
+    # (not adjusted for DST) on the current day. Azimuth is measured clockwise
+    # from North. Elevation is geometric: refraction is ignored.
+    def sun_pos(self, secs):
+        return next(self.sun_track(secs, 1, 1))
+
+    # Generator yielding (azimuth, elevation) for n samples at intervals of step
+    # secs from start. Per sample, the sidereal angle is advanced by rotation
+    # and the sun's position is interpolated. Both are recomputed every hour.
+    def sun_track(self, start=0, step=60, n=1440):
+        sglat = self.sglat
+        cglat = self.cglat
+        sun = self.ephem[0]
+        dh = step / 3600  # Hours per step
+        seg = max(1, int(1 / dh))  # Steps between recalculations
+        ds = radians((15 + 0.98564736629 / 24) * dh)  # Sidereal angle per step
+        cd = cos(ds)
+        sd = sin(ds)
+        i = 0
+        while i < n:
+            hour = (start - self.lto) / 3600 + i * dh  # UTC hours relative to .mjd
+            m = min(seg, n - i)
+            t = ((self.mjd - 51544.5) + hour / 24.0) / 36525.0
+            x, y, z = sun(t)
+            x1, y1, z1 = sun(t + m * dh / 876600)  # 876600 hours per century
+            dx = (x1 - x) / m
+            dy = (y1 - y) / m
+            dz = (z1 - z) / m
+            tl = radians(lstt(t, hour) + self.long)  # Local sidereal time
+            c = cos(tl)
+            s = sin(tl)
+            for _ in range(m):
+                a = x * c + y * s  # cos(dec) * cos(hour angle)
+                b = x * s - y * c  # cos(dec) * sin(hour angle)
+                el = sglat * z + cglat * a
+                yield degrees(atan2(-b, cglat * z - sglat * a)) % 360, degrees(asin(el))
+                x += dx
+                y += dy
+                z += dz
+                c, s = c * cd - s * sd, s * cd + c * sd
+            i += m
+
+    # Fill an array("f") with (azimuth, elevation) pairs. See .sun_track().
+    def sun_fill(self, buf, start=0, step=60):
+        n = 0
+        for az, el in self.sun_track(start, step, len(buf) // 2):
+            buf[n] = az
+            buf[n + 1] = el
+            n += 2
+        return buf
+
+    # Write ndays of results starting at day offset day to a table file. An
+    # instance created with table=fname retrieves results from the file rather
+    # than calculating them.
+    def write_table(self, fname, day: int = 0, ndays: int = 30):
+        cols = self.calendar(day, ndays)
+        with open(fname, "wb") as f:
+            f.write(struct.pack(TABLE, *self._site(), get_mjd(day), ndays))
+            f.write(array("i", (col[n] for n in range(ndays) for col in cols)))
+        self._table = self._open_table(fname)
+
     def set_lto(self, t):  # Update the offset from UTC
         self.check_lto(t)  # No need to recalc beause date is unchanged
         self.lto = round(t * 3600)  # Localtime offset in secs
@@ -292,31 +519,89 @@ class RiSet:
 
     # Re-calculate rise and set times
     def update(self, mjd):
-        for x in range(len(self._times)):
-            self._times[x] = None  # Assume failure
-        days = (1, 2) if self.lto < 0 else (1,) if self.lto == 0 else (0, 1)
+        key = (mjd, self.sglat, self.long, self.lto, self.tlight, self.dst, self.ephem, self._curve)
+        cache = RiSet._cache
+        lru = RiSet._lru
+        if key in cache:
+            RiSet.hits += 1
+            lru.remove(key)  # Now most recently used
+            lru.append(key)
+            self._times = list(cache[key])
+            self.mjd = mjd
+            return
+        RiSet.misses += 1
+        if not self._read_table(mjd):
+            for x in range(len(self._times)):
+                self._times[x] = None  # Assume failure
+            for day in self._days():
+                # Adjust for local time and DST. Store in ._times if value is in
+                # 24-hour local time window
+                self.adjust(self._raw(mjd + day - 1), day)
+        self.mjd = mjd
+        if RiSet.cache_size > 0:
+            cache[key] = tuple(self._times)
+            lru.append(key)
+            while len(lru) > RiSet.cache_size:  # Evict least recently used
+                del cache[lru.pop(0)]
+
+    # Table file support. The header identifies the site: a file written by a
+    # different site is ignored. dst cannot be checked.
+    def _site(self):
+        return b"RSET", self.sglat, self.long, 2.0 if self.tlight is None else self.tlight, self.lto
+
+    def _open_table(self, fname):
+        size = struct.calcsize(TABLE)
+        try:
+            with open(fname, "rb") as f:
+                hdr = f.read(size)
+        except OSError:  # No file
+            return None
+        if len(hdr) == size:
+            hdr = struct.unpack(TABLE, hdr)
+            if hdr[:5] == self._site():
+                return fname, hdr[5], hdr[6]
+        return None
+
+    # Populate ._times from the table file. Return False if MJD is not in the table.
+    def _read_table(self, mjd):
+        if self._table is None:
+            return False
+        fname, mjd0, ndays = self._table
+        if not 0 <= mjd - mjd0 < ndays:
+            return False
+        buf = array("i", (NOEVENT for _ in range(6)))
+        with open(fname, "rb") as f:
+            f.seek(struct.calcsize(TABLE) + (mjd - mjd0) * 24)
+            f.readinto(buf)
+        self._times = [None if t == NOEVENT else t for t in buf]
+        return True
+
+    # Julian days either side of the current one which are required to cope with
+    # localtime. Day 1 is the current day.
+    def _days(self):
+        return (1, 2) if self.lto < 0 else (1,) if self.lto == 0 else (0, 1)
+
+    # Rise and set times in secs from midnight UTC on a given MJD, in ._times order.
+    def _raw(self, mjd):
+        self.mjd = mjd
         tr = None  # Assume no twilight calculations
         ts = None
-        for day in days:
-            self.mjd = mjd + day - 1
-            sr, ss = self.rise_set(True, False)  # Sun
-            # Twilight: only calculate if required
-            if self.tlight is not None:
-                tr, ts = self.rise_set(True, True)
-            mr, ms = self.rise_set(False, False)  # Moon
-            # Adjust for local time and DST. Store in ._times if value is in
-            # 24-hour local time window
-            self.adjust((sr, ss, mr, ms, tr, ts), day)
-        self.mjd = mjd
-
-    def adjust(self, times, day):
+        sr, ss = self.rise_set(True, False)  # Sun
+        # Twilight: only calculate if required
+        if self.tlight is not None:
+            tr, ts = self.rise_set(True, True)
+        mr, ms = self.rise_set(False, False)  # Moon
+        return sr, ss, mr, ms, tr, ts
+
+    def adjust(self, times, day, dest=None):
+        dest = self._times if dest is None else dest
         for idx, n in enumerate(times):
             if n is not None:
                 n += self.lto + (day - 1) * 86400
                 n = self.dst(n)  # Adjust for DST on day of n
                 h = n // 3600
                 if 0 <= h < 24:
-                    self._times[idx] = n
+                    dest[idx] = n
 
     def _format(self, n, variant):
         if (n is not None) and (variant & 4):  # Machine clock set to UTC
@@ -338,24 +623,12 @@ class RiSet:
         if not -15 < t < 15:
             raise ValueError("Invalid local time offset.")
 
-    # See https://github.com/orgs/micropython/discussions/13075
-    def lstt(self, t, h):
-        # Takes the mjd and the longitude (west negative) and then returns
-        # the local sidereal time in degrees. Im using Meeus formula 11.4
-        # instead of messing about with UTo and so on
-        # modified to use the pre-computed 't' value from sin_alt
-        d = t * 36525
-        df = frac(0.5 + h / 24)
-        c1 = 360
-        c2 = 0.98564736629
-        dsum = c1 * df + c2 * d  # dsum is still ~ 9000 on average, losing precision
-        lst = 280.46061837 + dsum + t * t * (0.000387933 - t / 38710000)
-        return lst
+    lstt = staticmethod(lstt)
 
     def sin_alt(self, hour, sun):
         # Returns the sine of the altitude of the object (moon or sun)
         # at an hour relative to the current date (mjd)
-        func = minisun if sun else minimoon
+        func = self.ephem[0] if sun else self.ephem[1]
         mjd = (self.mjd - 51544.5) + hour / 24.0
         # mjd = self.mjd + hour / 24.0
         t = mjd / 36525.0
@@ -366,38 +639,76 @@ class RiSet:
     # Calculate rise and set times of sun or moon for the current MJD. Times are
     # relative to that 24 hour period.
     def rise_set(self, sun, tl):
-        t_rise = None  # Rise and set times in secs from midnight
-        t_set = None
         if tl:
             sinho = -self.tlight
         else:
-            sinho = sin(radians(-0.833)) if sun else sin(radians(8 / 60))
-        # moonrise taken as centre of moon at +8 arcmin
-        # sunset upper limb simple refraction
-        # The loop finds the sin(alt) for sets of three consecutive
-        # hours, and then tests for a single zero crossing in the interval
-        # or for two zero crossings in an interval for for a grazing event
-        yp = self.sin_alt(0, sun) - sinho
-        for hour in range(1, 24, 2):
-            ym = yp
-            yz = self.sin_alt(hour, sun) - sinho
-            yp = self.sin_alt(hour + 1, sun) - sinho
-            nz, z1, z2, ye = quad(ym, yz, yp)  # Find horizon crossings
-            if nz == 1:  # One crossing found
-                if ym < 0.0:
-                    t_rise = 3600 * (hour + z1)
-                else:
-                    t_set = 3600 * (hour + z1)
-            # case where two events are found in this interval
-            # (rare but whole reason we are not using simple iteration)
-            elif nz == 2:
-                if ye < 0.0:
-                    t_rise = 3600 * (hour + z2)
-                    t_set = 3600 * (hour + z1)
-                else:
-                    t_rise = 3600 * (hour + z1)
-                    t_set = 3600 * (hour + z2)
-
-            if t_rise is not None and t_set is not None:
-                break  # All done
-        return to_int(t_rise), to_int(t_set)  # Convert to int preserving None values
+            sinho = SINHO_SUN if sun else SINHO_MOON
+        ys = self._samples(sun)
+        return crossings(lambda hour: self._sample(ys, hour, sun) - sinho)
+
+    # Sun and moon altitudes are sampled hourly. The samples are cached per MJD
+    # so that rise and set and twilight share them. Adjacent days and the two
+    # days required by a nonzero LTO also share them.
+    # Return the list of samples for the current MJD. Entries are None until
+    # calculated. In fixed point mode a Curve computes entries on access.
+    def _samples(self, sun):
+        key = (self.mjd, sun)
+        ys = self._ys.get(key)
+        if ys is None:
+            mjd = self.mjd
+            for k in [k for k in self._ys if abs(k[0] - mjd) > 2]:
+                del self._ys[k]  # Retain samples for MJDs which may be revisited
+            if self._curve is None:
+                ys = [None] * 25
+            else:
+                ys = self._curve(self.mjd, sun, self.sglat, self.cglat, self.long)
+            self._ys[key] = ys
+        return ys
+
+    def _sample(self, ys, hour, sun):
+        y = ys[hour]
+        if y is None:
+            y = self.sin_alt(hour, sun)
+            ys[hour] = y
+        return y
+
+
+# Asynchronous iterator yielding (name, t) for each sun and moon event as it
+# occurs, where name is in EVENTS and t is the event time in secs since the
+# platform epoch, adjusted by the RiSet's dst function. Sleeps until each event
+# is due. When the current day's events are exhausted the RiSet is moved on to
+# the next day with .set_day(). MicroPython lacks asynchronous generators.
+# Usage: async for name, t in events(rs):
+class Events:
+    def __init__(self, rs):
+        try:  # Imported here so that sun_moon does not require asyncio
+            import uasyncio as asyncio
+        except ImportError:
+            import asyncio
+        self.asyncio = asyncio
+        self.rs = rs
+        self.queue = []  # (machine time, index into EVENTS) in time order
+        self.done = None  # ._t0 of day whose events have been queued
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        rs = self.rs
+        while not self.queue:
+            if self.done == rs._t0:  # Move to the following day
+                rs.set_day(rs._t0 // 86400 + 1 - rs.mtime() // 86400)
+            self.done = rs._t0
+            now = rs.dst(rs.mtime())  # ._times are DST-adjusted: see .has_x()
+            for idx, n in enumerate(rs._times):
+                if n is not None and n + rs._t0 > now:
+                    self.queue.append((n + rs._t0, idx))
+            self.queue.sort()
+        t, idx = self.queue.pop(0)
+        if (delay := t - rs.dst(rs.mtime())) > 0:
+            await self.asyncio.sleep(delay)
+        return EVENTS[idx], t
+
+
+def events(rs):
+    return Events(rs)
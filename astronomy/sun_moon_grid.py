@@ -0,0 +1,103 @@
+# sun_moon_grid.py Rise and set times for many sites on one date
+
+# Copyright (c) Peter Hinch 2023
+# Released under the MIT license (see LICENSE)
+
+# Positions of the sun and moon and the sidereal time are the same for every
+# site. These are computed once for each hour of the day. Each site then costs
+# three multiplications per hourly sample plus the root finding.
+
+# Usage:
+# from sched.sun_moon_grid import grid
+# sites = ((53.30, -2.10), (47.61, -122.35), (-33.86, 151.21))
+# sunrise, sunset, moonrise, moonset, _, _ = grid(sites, 60282)
+
+from array import array
+from math import sin, cos, radians
+
+try:
+    from .sun_moon import minisun, minimoon, lstt, crossings, NOEVENT, SINHO_SUN, SINHO_MOON
+except ImportError:  # Running on PC in astronomy directory
+    from sun_moon import minisun, minimoon, lstt, crossings, NOEVENT, SINHO_SUN, SINHO_MOON
+
+
+# Site independent data for hours 0..24 of an MJD. Returns lists z, a, b where
+# sin(alt) = sin(lat) * z + cos(lat) * (cos(long) * a + sin(long) * b)
+def hourly(mjd, func):
+    zs = []
+    as_ = []
+    bs = []
+    for hour in range(25):
+        t = ((mjd - 51544.5) + hour / 24.0) / 36525.0
+        x, y, z = func(t)
+        tl = radians(lstt(t, hour))  # Sidereal time at Greenwich
+        c = cos(tl)
+        s = sin(tl)
+        zs.append(z)
+        as_.append(x * c + y * s)
+        bs.append(y * c - x * s)
+    return zs, as_, bs
+
+
+# Rise and set times for a sequence of (lat, long) pairs on one MJD. Returns a
+# tuple of six array("i") columns in the order sunrise, sunset, moonrise,
+# moonset, twilight start, twilight end. Values are secs from 00:00:00 UTC or
+# NOEVENT. tl is the twilight angle in degrees (as per RiSet).
+# On CPython the sites may be processed by NumPy and may be divided between
+# `processes` worker processes.
+def grid(sites, mjd, tl=None, ephem=(minisun, minimoon), processes=0):
+    if processes > 1:
+        return _pool(sites, mjd, tl, ephem, processes)
+    cols = tuple(array("i") for _ in range(6))
+    sun = hourly(mjd, ephem[0])
+    moon = hourly(mjd, ephem[1])
+    tlight = None if tl is None else sin(radians(tl))
+    for ys, ym in _np_alts(sites, sun, moon) or _alts(sites, sun, moon):
+        sr, ss = crossings(lambda hour: ys[hour] - SINHO_SUN)
+        tr = None
+        ts = None
+        if tlight is not None:
+            tr, ts = crossings(lambda hour: ys[hour] + tlight)
+        mr, ms = crossings(lambda hour: ym[hour] - SINHO_MOON)
+        for col, t in zip(cols, (sr, ss, mr, ms, tr, ts)):
+            col.append(NOEVENT if t is None else t)
+    return cols
+
+
+# Generator yielding lists of hourly sin(alt) values for sun and moon per site.
+def _alts(sites, sun, moon):
+    for lat, long in sites:
+        sglat = sin(radians(lat))
+        cglat = cos(radians(lat))
+        cl = cglat * cos(radians(long))
+        sl = cglat * sin(radians(long))
+        yield tuple([sglat * z + cl * a + sl * b for z, a, b in zip(*body)] for body in (sun, moon))
+
+
+# As above, computed as (nsites, 25) arrays. Returns None if NumPy is absent.
+def _np_alts(sites, sun, moon):
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    lat, long = np.radians(np.array(sites, dtype=float).reshape(-1, 2)).T
+    sglat = np.sin(lat)[:, None]
+    cl = (np.cos(lat) * np.cos(long))[:, None]
+    sl = (np.cos(lat) * np.sin(long))[:, None]
+    res = [(sglat * np.array(z) + cl * np.array(a) + sl * np.array(b)).tolist() for z, a, b in (sun, moon)]
+    return zip(*res)
+
+
+# CPython: divide sites between worker processes and concatenate the results.
+def _pool(sites, mjd, tl, ephem, processes):
+    from multiprocessing import Pool
+
+    sites = list(sites)
+    size = -(-len(sites) // processes)  # Round up
+    chunks = [(sites[n : n + size], mjd, tl, ephem) for n in range(0, len(sites), size)]
+    cols = tuple(array("i") for _ in range(6))
+    with Pool(processes) as pool:
+        for res in pool.starmap(grid, chunks):
+            for col, r in zip(cols, res):
+                col.extend(r)
+    return cols
@@ -9,10 +9,15 @@
 # import sun_moon_test
 
 try:
-    from .sun_moon import RiSet
+    from .sun_moon import RiSet, NOEVENT, minisun, minimoon, events
+    from .chebyshev import fit
+    from .sun_moon_grid import grid
 except ImportError:  # Running on PC in astronomy directory
-    from sun_moon import RiSet
+    from sun_moon import RiSet, NOEVENT, minisun, minimoon, events
+    from chebyshev import fit
+    from sun_moon_grid import grid
 import time
+import asyncio
 
 
 def mtime(h, m, t=None):
@@ -118,6 +123,62 @@ for act, requirement in zip(nresults, exp):
 
 print(f"Maximum error {max_error}. Expect 0 on 64-bit platform, 30s on 32-bit")
 
+print("Cache: instances for the same site share results")
+RiSet.cache_clear()
+RiSet.set_time(19695 * 86400)
+rs = RiSet(lat=47.61, long=-122.35, lto=-8)
+rs1 = RiSet(lat=47.61, long=-122.35, lto=-8).set_day(1)
+rs1.set_day(0)
+if (RiSet.hits, RiSet.misses) != (2, 2) or rs1.sunrise() != rs.sunrise():
+    print(f"Cache error hits {RiSet.hits} misses {RiSet.misses}")
+
+print("Altitudes: 4th Dec 2023, UK")
+RiSet.set_time(19695 * 86400)
+rs = RiSet(tl=6)
+if rs.altitudes((-6, -0.833)) != [(rs.tstart(), rs.tend()), (rs.sunrise(), rs.sunset())]:
+    print("Altitudes error")
+
+print("Sun position: 4th Dec 2023, UK")
+az, el = rs.sun_pos(rs.sunrise())
+if abs(el + 0.833) > 0.05:
+    print(f"Sun position error: elevation {el} at sunrise")
+az, el = rs.sun_pos((rs.sunrise() + rs.sunset()) // 2)
+if abs(az - 180) > 1:
+    print(f"Sun position error: azimuth {az} at noon")
+
+print("Calendar: 7 days from 4th Dec 2023, UK")
+RiSet.set_time(19695 * 86400)
+cal = RiSet().calendar(0, 7)
+for day in range(7):
+    for col, requirement in zip(cal, exp[8 + 4 * day : 12 + 4 * day]):
+        act = col[day]
+        if requirement is None:
+            if act != NOEVENT:
+                print(f"Calendar error day {day}: expected no event")
+        elif abs(requirement - act) > 30:
+            print(f"Calendar error day {day}: {requirement - act}")
+
+print("Chebyshev ephemerides: 7 days from 4th Dec 2023, UK")
+ephem = (fit(minisun, 60281, 9, 32, 8), fit(minimoon, 60281, 9, 8, 8))
+cal = RiSet(ephem=ephem).calendar(0, 7)
+for day in range(7):
+    for col, requirement in zip(cal, exp[8 + 4 * day : 12 + 4 * day]):
+        if requirement is not None and abs(requirement - col[day]) > 30:
+            print(f"Chebyshev error day {day}: {requirement - col[day]}")
+
+print("Fixed point: 7 days from 4th Dec 2023, UK")
+cal = RiSet(fixed=True).calendar(0, 7)
+for day in range(7):
+    for col, requirement in zip(cal, exp[8 + 4 * day : 12 + 4 * day]):
+        if requirement is not None and abs(requirement - col[day]) > 60:
+            print(f"Fixed point error day {day}: {requirement - col[day]}")
+
+print("Grid: 4th Dec 2023, UK")
+cols = grid(((53.29756504536339, -2.102811634540558),), 60282)
+for col, requirement in zip(cols, exp[8:12]):
+    if abs(requirement - col[0]) > 30:
+        print(f"Grid error {requirement - col[0]}")
+
 # Times from timeanddate.com
 # Seattle
 # Sunrise 7:40 sunset 16:18 Moonrise 23:37 Moonset 12:53
@@ -174,3 +235,35 @@ def testup(t):  # Time in secs since machine epoch
 # t = time.time()
 # for d in range(365):
 #     testup(t + d * 86400)
+
+print("Events: 4th Dec 2023, Sydney with DST")
+
+
+async def fake_sleep(t):  # Advance the clock rather than waiting
+    RiSet.tim += t
+
+
+async def next_events(rs, n):
+    res = []
+    it = events(rs)
+    for _ in range(n):
+        name, t = await it.__anext__()
+        if rs.dst(rs.mtime()) != t:
+            print(f"Events error: {name} returned at wrong time")
+        res.append((name, t))
+    return res
+
+
+sleep = asyncio.sleep
+asyncio.sleep = fake_sleep
+try:
+    RiSet.set_time(19695 * 86400)
+    rs = RiSet(lat=-33.86, long=151.21, lto=11, dst=lambda x: x + 3600)
+    rs.set_day()
+    expected = sorted((t, name) for name, t in (("sunrise", rs.sunrise(1)), ("sunset", rs.sunset(1)),
+                                           ("moonrise", rs.moonrise(1)), ("moonset", rs.moonset(1)))
+                 if t is not None and t > rs.dst(rs.mtime()))
+    if [(name, t) for t, name in expected] != asyncio.run(next_events(rs, len(expected))):
+        print("Events error: wrong times")
+finally:
+    asyncio.sleep = sleep
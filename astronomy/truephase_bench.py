@@ -0,0 +1,110 @@
+# truephase_bench.py Compare moonphase.truephase with the original series
+
+# Copyright (c) Peter Hinch 2023
+# Released under the MIT license (see LICENSE)
+
+# The original evaluated sin(radians(...)) for each term. The current version
+# evaluates sin and cos of the three base angles and derives the remainder.
+# Runs on CPython or MicroPython. Checks that results are identical and reports
+# the time per call.
+# On PC in astronomy directory:
+# python3 truephase_bench.py
+# On mip-installed host:
+# import sched.truephase_bench
+
+try:
+    from .moonphase import truephase
+except ImportError:  # Running on PC in astronomy directory
+    from moonphase import truephase
+from math import radians, sin, cos
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:  # CPython
+    from time import perf_counter
+
+    def ticks_us():
+        return round(perf_counter() * 1_000_000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+def truephase_series(k: int, phi: int) -> int:
+    k += (0, 0.25, 0.5, 0.75)[phi]  # Add phase to new moon time
+    t = k / 1236.85  # Time in Julian centuries from 1900 January 0.5
+    t2 = t * t  # Square for frequent use
+    t3 = t2 * t  # Cube for frequent use
+    # Sun's mean anomaly
+    m = 359.2242 + 29.10535608 * k - 0.0000333 * t2 - 0.00000347 * t3
+    # Moon's mean anomaly
+    mprime = 306.0253 + 385.81691806 * k + 0.0107306 * t2 + 0.00001236 * t3
+    # Moon's argument of latitude
+    f = 21.2964 + 390.67050646 * k - 0.0016528 * t2 - 0.00000239 * t3
+    if phi in (0, 2):  # Corrections for New and Full Moon
+        pt = (0.1734 - 0.000393 * t) * sin(radians(m))
+        pt += 0.0021 * sin(radians(2 * m))
+        pt -= 0.4068 * sin(radians(mprime))
+        pt += 0.0161 * sin(radians(2 * mprime))
+        pt -= 0.0004 * sin(radians(3 * mprime))
+        pt += 0.0104 * sin(radians(2 * f))
+        pt -= 0.0051 * sin(radians(m + mprime))
+        pt -= 0.0074 * sin(radians(m - mprime))
+        pt += 0.0004 * sin(radians(2 * f + m))
+        pt -= 0.0004 * sin(radians(2 * f - m))
+        pt -= 0.0006 * sin(radians(2 * f + mprime))
+        pt += 0.0010 * sin(radians(2 * f - mprime))
+        pt += 0.0005 * sin(radians(m + 2 * mprime))
+    else:  # First or last quarter
+        pt = (0.1721 - 0.0004 * t) * sin(radians(m))
+        pt += 0.0021 * sin(radians(2 * m))
+        pt -= 0.6280 * sin(radians(mprime))
+        pt += 0.0089 * sin(radians(2 * mprime))
+        pt -= 0.0004 * sin(radians(3 * mprime))
+        pt += 0.0079 * sin(radians(2 * f))
+        pt -= 0.0119 * sin(radians(m + mprime))
+        pt -= 0.0047 * sin(radians(m - mprime))
+        pt += 0.0003 * sin(radians(2 * f + m))
+        pt -= 0.0004 * sin(radians(2 * f - m))
+        pt -= 0.0006 * sin(radians(2 * f + mprime))
+        pt += 0.0021 * sin(radians(2 * f - mprime))
+        pt += 0.0003 * sin(radians(m + 2 * mprime))
+        pt += 0.0004 * sin(radians(m - 2 * mprime))
+        pt -= 0.0003 * sin(radians(2 * m + mprime))
+        if phi < 2:  # First quarter correction
+            pt += 0.0028 - 0.0004 * cos(radians(m)) + 0.0003 * cos(radians(mprime))
+        else:  # Last quarter correction
+            pt += -0.0028 + 0.0004 * cos(radians(m)) - 0.0003 * cos(radians(mprime))
+    pt = round(pt * 86400)  # Integer seconds from here
+    pt += round(2_953_058_868 * 864 * k) // 1000_000  # round(SYNMONTH * k * 86400)
+    qq = 0.0001178 * t2 - 0.000000155 * t3
+    qq += 0.00033 * sin(radians(166.56 + 132.87 * t - 0.009173 * t2))
+    pt += round(qq * 86400)  # qq amounts to 2s
+    return pt + 208_657_793_606
+
+
+def bench(func, k0, n):
+    t = ticks_us()
+    for k in range(k0, k0 + n):
+        for phi in range(4):
+            func(k, phi)
+    return ticks_diff(ticks_us(), t) / (4 * n)
+
+
+def test(k0=1450, n=250):  # Lunations 1450-1699 span 1917-2037
+    errors = 0
+    maxerr = 0
+    for k in range(k0, k0 + n):
+        for phi in range(4):
+            if (err := abs(truephase(k, phi) - truephase_series(k, phi))):
+                errors += 1
+                maxerr = max(err, maxerr)
+    # Expect 0 on 64-bit platform. With 32-bit floats rounding may differ by 1s.
+    print(f"Lunations {k0}-{k0 + n - 1}: {errors} differences, max {maxerr}s")
+    ts = bench(truephase_series, k0, n)
+    tn = bench(truephase, k0, n)
+    print(f"Original {ts:7.1f}μs per call")
+    print(f"Current  {tn:7.1f}μs per call ({ts / tn:4.2f}x)")
+
+
+test()
@@ -5,8 +5,77 @@
 
 import gc
 from math import pi
-from quat import Rotator, Point
+from array import array
+from quat import Rotator, Point, transform_points
 from setup3d import fill, line, show, DIMENSION
+try:
+    from setup3d import fill_rect
+except ImportError:  # Optional: required by DisplayDict erase mode
+    fill_rect = None
+
+# Rotate a Point using a matrix from Quaternion.to_matrix(). The matrix is
+# cached by the rotator, so rotating many points costs 9 multiplications each.
+def _rotate(p, m):
+    _, x, y, z = p
+    return (m[0]*x + m[1]*y + m[2]*z, m[3]*x + m[4]*y + m[5]*z, m[6]*x + m[7]*y + m[8]*z)
+
+_NEAR = 0.1  # Near clipping plane: minimum distance of a point from the camera
+
+# Clip a line in display coordinates to the square viewing area (Liang-Barsky).
+# Return xs, ys, xe, ye or None if the line is outside the area.
+def _clip(xs, ys, xe, ye):
+    lim = 2 * DIMENSION - 1
+    dx = xe - xs
+    dy = ye - ys
+    t0 = 0
+    t1 = 1
+    for p, q in ((-dx, xs), (dx, lim - xs), (-dy, ys), (dy, lim - ys)):
+        if p == 0:  # Parallel to this edge
+            if q < 0:
+                return None
+        else:
+            t = q / p
+            if p < 0:
+                if t > t1:
+                    return None
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return None
+                t1 = min(t1, t)
+    return round(xs + t0 * dx), round(ys + t0 * dy), round(xs + t1 * dx), round(ys + t1 * dy)
+
+# Project a line with perspective applied (see Line.camera) onto the display.
+# It is clipped to the near plane and to the viewing area. Return xs, ys, xe, ye
+# or None if the line is not visible.
+def _project(xs, ys, zs, xe, ye, ze):
+    if zs < _NEAR:
+        if ze < _NEAR:  # Behind the camera
+            return None
+        t = (_NEAR - zs) / (ze - zs)
+        xs += t * (xe - xs)
+        ys += t * (ye - ys)
+        zs = _NEAR
+    elif ze < _NEAR:
+        t = (_NEAR - ze) / (zs - ze)
+        xe += t * (xs - xe)
+        ye += t * (ys - ye)
+        ze = _NEAR
+    w = DIMENSION  # Viewing area is square
+    h = w
+    xs = (1 + xs/zs) * w
+    ys = (1 - ys/zs) * h
+    xe = (1 + xe/ze) * w
+    ye = (1 - ye/ze) * h
+    lim = 2 * w - 1
+    if 0 <= xs <= lim and 0 <= ys <= lim and 0 <= xe <= lim and 0 <= ye <= lim:
+        return round(xs), round(ys), round(xe), round(ye)
+    return _clip(xs, ys, xe, ye)
+
+# Return a new Point being p rotated and with perspective applied.
+def _camera(p, rot, distance):
+    x, y, z = _rotate(p, rot.to_matrix())
+    return Point(x * distance, y * distance, distance - z)
 
 class Line:
     def __init__(self, p0, p1, color):
@@ -15,17 +84,18 @@ class Line:
         self.end = p1
         self.color = color
 
-    def show(self, ssd):
+    # Handle perspective and scale to display. Return xs, ys, xe, ye or None if
+    # the line is not visible.
+    def xy(self):
         _, xs, ys, zs = self.start
         _, xe, ye, ze = self.end
-        # Handle perspective and scale to display
-        w = DIMENSION  # Viewing area is square
-        h = w
-        xs = round((1 + xs/zs) * w)
-        ys = round((1 - ys/zs) * h)
-        xe = round((1 + xe/ze) * w)
-        ye = round((1 - ye/ze) * h)
-        line(xs,ys, xe, ye, self.color)
+        return _project(xs, ys, zs, xe, ye, ze)
+
+    def show(self, ssd):
+        xy = self.xy()
+        if xy is not None:
+            xs, ys, xe, ye = xy
+            line(xs,ys, xe, ye, self.color)
 
     def __add__(self, to):  # to is a Point or 3-tuple
         return Line(self.start + to, self.end + to, self.color)
@@ -38,44 +108,162 @@ class Line:
 
     def __matmul__(self, rot):  # rot is a rotation quaternion
         #assert rot.isrot()
-        return Line(self.start @ rot, self.end @ rot, self.color)
+        m = rot.to_matrix()
+        return Line(Point(*_rotate(self.start, m)), Point(*_rotate(self.end, m)), self.color)
 
     def camera(self, rot, distance):  # rot is a rotation quaternion, distance is scalar
         #assert rot.isrot()
-        gc.collect()
-        ps = self.start @ rot
-        ps = Point(ps.x * distance, ps.y * distance, distance - ps.z)
-        pe = self.end @ rot
-        pe = Point(pe.x * distance, pe.y * distance, distance - pe.z)
-        return Line(ps, pe, self.color)
+        return Line(_camera(self.start, rot, distance), _camera(self.end, rot, distance), self.color)
 
     def __str__(self):
         return 'start {} end {}'.format(self.start, self.end)
 
+# Projected lines are an array('h') of xs, ys, xe, ye for each line, with a
+# color or a sequence of one color per line.
+def _draw(segs, colors):
+    c = colors
+    for i in range(0, len(segs), 4):
+        if not isinstance(colors, int):
+            c = colors[i // 4]
+        line(segs[i], segs[i + 1], segs[i + 2], segs[i + 3], c)
+
+def _bbox(segs):  # Return x0, y0, x1, y1 bounding projected lines or None
+    if not segs:
+        return None
+    x0 = x1 = segs[0]
+    y0 = y1 = segs[1]
+    for i in range(2, len(segs), 2):  # MicroPython arrays can't slice with a step
+        x = segs[i]
+        y = segs[i + 1]
+        x0 = min(x0, x); x1 = max(x1, x)
+        y0 = min(y0, y); y1 = max(y1, y)
+    return x0, y0, x1, y1
+
+def _overlap(a, b):  # Bounding boxes intersect
+    return (a is not None and b is not None and a[0] <= b[2] and b[0] <= a[2]
+            and a[1] <= b[3] and b[1] <= a[3])
+
+def _scale(by):  # by is a scalar or a 3-tuple
+    return (by, by, by) if isinstance(by, (int, float)) else by[-3:]
+
+# An affine transform p -> (scale * p) @ rot + offset where scale multiplies
+# x, y and z by its three elements. Shape operators accumulate a Transform
+# rather than transforming every vertex. Instances are not changed by methods.
+class Transform:
+    def __init__(self, rot=None, scale=(1, 1, 1), offset=(0, 0, 0)):
+        self.rot = rot  # A rotation quaternion or None
+        self.scale = scale
+        self.offset = offset
+        self._m = None  # Cached matrix
+
+    def moved(self, v, sign=1):  # v is a Point or 3-tuple
+        dx, dy, dz = v[-3:]
+        x, y, z = self.offset
+        return Transform(self.rot, self.scale, (x + sign * dx, y + sign * dy, z + sign * dz))
+
+    # Return None if the result can't be represented: a nonuniform scale after
+    # a rotation.
+    def scaled(self, by):
+        sx, sy, sz = _scale(by)
+        if self.rot is not None and not sx == sy == sz:
+            return None
+        x, y, z = self.scale
+        ox, oy, oz = self.offset
+        return Transform(self.rot, (x * sx, y * sy, z * sz), (ox * sx, oy * sy, oz * sz))
+
+    def rotated(self, rot):
+        r = rot.copy() if self.rot is None else (rot * self.rot).normalise_inplace()  # Limit accumulation of errors
+        x, y, z = self.offset
+        return Transform(r, self.scale, _rotate((0, x, y, z), rot.to_matrix()))
+
+    # 3x3 matrix combining rotation and scale, as a tuple in row order
+    def matrix(self):
+        if self._m is None:
+            sx, sy, sz = self.scale
+            m = (1, 0, 0, 0, 1, 0, 0, 0, 1) if self.rot is None else self.rot.to_matrix()
+            self._m = (m[0]*sx, m[1]*sy, m[2]*sz, m[3]*sx, m[4]*sy, m[5]*sz, m[6]*sx, m[7]*sy, m[8]*sz)
+        return self._m
+
+    # Transform a Point returning a new Point. If distance is passed, apply
+    # perspective as per Line.camera.
+    def point(self, p, distance=None):
+        x, y, z = _rotate(p, self.matrix())
+        ox, oy, oz = self.offset
+        if distance is None:
+            return Point(x + ox, y + oy, z + oz)
+        return Point((x + ox) * distance, (y + oy) * distance, distance - z - oz)
+
+    # Transform a flat array of x, y, z triples into dst, which is returned.
+    # If distance is passed, apply perspective.
+    def apply(self, src, dst, distance=None):
+        m00, m01, m02, m10, m11, m12, m20, m21, m22 = self.matrix()
+        ox, oy, oz = self.offset
+        for i in range(0, len(src), 3):
+            x = src[i]; y = src[i + 1]; z = src[i + 2]
+            px = m00*x + m01*y + m02*z + ox
+            py = m10*x + m11*y + m12*z + oy
+            pz = m20*x + m21*y + m22*z + oz
+            if distance is None:
+                dst[i] = px; dst[i + 1] = py; dst[i + 2] = pz
+            else:
+                dst[i] = px * distance; dst[i + 1] = py * distance; dst[i + 2] = distance - pz
+        return dst
+
+_IDENTITY = Transform()
+
+# Operators return a new Shape sharing the lines of the original, with an
+# updated Transform. This is applied when .camera() is called.
 class Shape:
-    def __init__(self, lines):
-        self.lines = lines
+    def __init__(self, lines, xf=None):
+        self._lines = lines
+        self.xf = xf  # Pending Transform or None
+
+    def _new(self, xf):
+        return Shape(self._lines, xf)
+
+    def _xf(self):
+        return _IDENTITY if self.xf is None else self.xf
+
+    # The lines with any pending transform applied. This allocates.
+    @property
+    def lines(self):
+        xf = self.xf
+        if xf is None:
+            return self._lines
+        return [Line(xf.point(l.start), xf.point(l.end), l.color) for l in self._lines]
+
+    def apply(self):  # Return a Shape with the pending transform applied
+        return Shape(self.lines)
 
     def __add__(self, to):
-        return Shape([l + to for l in self.lines])
+        return self._new(self._xf().moved(to))
 
     def __sub__(self, v):
-        return Shape([l - v for l in self.lines])
+        return self._new(self._xf().moved(v, -1))
 
     def __mul__(self, by):
-        return Shape([l * by for l in self.lines])
+        xf = self._xf().scaled(by)
+        if xf is None:  # Apply pending transform first
+            return self.apply() * by
+        return self._new(xf)
 
     def __matmul__(self, rot):
-        l = []
-        for line in self.lines:
-            l.append(line @ rot)
-        return Shape(l)
+        return self._new(self._xf().rotated(rot))
 
     def camera(self, rot, distance):
-        l = []
-        for line in self.lines:
-            l.append(line.camera(rot, distance))
-        return Shape(l)
+        xf = self._xf().rotated(rot)
+        return Shape([Line(xf.point(l.start, distance), xf.point(l.end, distance), l.color) for l in self._lines])
+
+    # Return the projected lines (see _draw) as seen from the camera.
+    def project(self, rot, distance):
+        segs = array('h')
+        colors = array('I')
+        for l in self.camera(rot, distance)._lines:
+            xy = l.xy()
+            if xy is not None:
+                segs.extend(xy)
+                colors.append(l.color)
+        return segs, colors
 
     def show(self, ssd):
         for line in self.lines:
@@ -87,86 +275,176 @@ class Shape:
             r = ''.join((r, '{}\n'.format(line)))
         return r
 
-class Axes(Shape):
+# A Mesh stores each vertex once, in an array of x, y, z triples. Edges are
+# pairs of vertex indices. Transformations process each vertex once.
+# verts: iterable of floats. edges: iterable of ints, two per edge. color: a
+# color for all edges or a sequence with one color per edge.
+class Mesh(Shape):
+    def __init__(self, verts, edges, color, xf=None):
+        self._verts = verts if isinstance(verts, array) else array('f', verts)
+        self.edges = edges if isinstance(edges, array) else array('H', edges)
+        self.colors = color if isinstance(color, int) else array('I', color)
+        self.xf = xf
+
+    def _new(self, xf):  # Share vertices, edges and colors with a new Mesh
+        return Mesh(self._verts, self.edges, self.colors, xf)
+
+    # The vertices with any pending transform applied. This allocates.
+    @property
+    def verts(self):
+        v = self._verts
+        return v if self.xf is None else self.xf.apply(v, array('f', v))
+
+    def apply(self):
+        return Mesh(self.verts, self.edges, self.colors)
+
+    def camera(self, rot, distance):
+        xf = self._xf().rotated(rot)
+        v = self._verts
+        return Mesh(xf.apply(v, array('f', v), distance), self.edges, self.colors)
+
+    # Handle perspective and scale to display. Return the projected lines (see
+    # _draw). Each vertex is projected once. Edges with a vertex which is off
+    # screen or behind the near plane are clipped or discarded.
+    def _segs(self):
+        v = self.verts
+        w = DIMENSION  # Viewing area is square
+        h = w
+        lim = 2 * w - 1
+        n = len(v) // 3
+        xy = array('h', (0 for _ in range(2 * n)))
+        vis = bytearray(n)  # 1 if vertex was projected into viewing area
+        for i in range(n):
+            z = v[3 * i + 2]
+            if z >= _NEAR:
+                x = (1 + v[3 * i]/z) * w
+                y = (1 - v[3 * i + 1]/z) * h
+                if 0 <= x <= lim and 0 <= y <= lim:
+                    xy[2 * i] = round(x)
+                    xy[2 * i + 1] = round(y)
+                    vis[i] = 1
+        e = self.edges
+        c = self.colors
+        segs = array('h')
+        colors = c if isinstance(c, int) else array('I')
+        for n in range(0, len(e), 2):
+            s = e[n]
+            f = e[n + 1]
+            if vis[s] and vis[f]:
+                s *= 2
+                f *= 2
+                segs.append(xy[s]); segs.append(xy[s + 1])
+                segs.append(xy[f]); segs.append(xy[f + 1])
+            else:
+                s *= 3
+                f *= 3
+                p = _project(v[s], v[s + 1], v[s + 2], v[f], v[f + 1], v[f + 2])
+                if p is None:
+                    continue
+                segs.extend(p)
+            if not isinstance(c, int):
+                colors.append(c[n // 2])
+        return segs, colors
+
+    def project(self, rot, distance):
+        return self.camera(rot, distance)._segs()
+
+    def show(self, ssd):
+        segs, colors = self._segs()
+        _draw(segs, colors)
+
+    # The shape as a list of Line instances. This allocates.
+    @property
+    def lines(self):
+        v = self.verts
+        e = self.edges
+        c = self.colors
+        l = []
+        for n in range(0, len(e), 2):
+            s = 3 * e[n]
+            f = 3 * e[n + 1]
+            l.append(Line(Point(*v[s : s + 3]), Point(*v[f : f + 3]), c if isinstance(c, int) else c[n // 2]))
+        return l
+
+# Append a ring of points about the y axis, starting at (1, y, 0), to verts.
+def _ring(verts, y, segments):
+    rot = Rotator(2*pi/segments, 0, 1, 0)
+    p = Point(1, y, 0)
+    for _ in range(segments):
+        verts.extend(p[1:])
+        p @= rot  # In place
+
+class Axes(Mesh):
     def __init__(self, color):
-        l = (Line(Point(-1.0, 0, 0), Point(1.0, 0, 0), color),
-             Line(Point(0, -1.0, 0), Point(0, 1.0, 0), color),
-             Line(Point(0, 0, -1.0), Point(0, 0, 1.0), color))
-        super().__init__(l)
+        super().__init__((-1.0, 0, 0, 1.0, 0, 0, 0, -1.0, 0, 0, 1.0, 0, 0, 0, -1.0, 0, 0, 1.0),
+                         (0, 1, 2, 3, 4, 5), color)
 
-class Square(Shape):  # Unit square in XY plane
+class Square(Mesh):  # Unit square in XY plane
     def __init__(self, color):  # Corner located at origin
-        l = (Line(Point(0, 0, 0), Point(1, 0, 0), color),
-             Line(Point(1, 0, 0), Point(1, 1, 0), color),
-             Line(Point(1, 1, 0), Point(0, 1, 0), color),
-             Line(Point(0, 1, 0), Point(0, 0, 0), color))
-        super().__init__(l)
+        super().__init__((0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0), (0, 1, 1, 2, 2, 3, 3, 0), color)
 
-class Cube(Shape):
+class Cube(Mesh):
     def __init__(self, color, front=None, sides=None):  # Corner located at origin
         front = color if front is None else front
         sides = color if sides is None else sides
-        l = (Line(Point(0, 0, 0), Point(1, 0, 0), color),
-             Line(Point(1, 0, 0), Point(1, 1, 0), color),
-             Line(Point(1, 1, 0), Point(0, 1, 0), color),
-             Line(Point(0, 1, 0), Point(0, 0, 0), color),
-             Line(Point(0, 0, 1), Point(1, 0, 1), front),
-             Line(Point(1, 0, 1), Point(1, 1, 1), front),
-             Line(Point(1, 1, 1), Point(0, 1, 1), front),
-             Line(Point(0, 1, 1), Point(0, 0, 1), front),
-             Line(Point(0, 0, 0), Point(0, 0, 1), sides),
-             Line(Point(1, 0, 0), Point(1, 0, 1), sides),
-             Line(Point(1, 1, 0), Point(1, 1, 1), sides),
-             Line(Point(0, 1, 0), Point(0, 1, 1), sides),
-             )
-        super().__init__(l)
-
-class Cone(Shape):
+        verts = (0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0,  # Back face
+                 0, 0, 1, 1, 0, 1, 1, 1, 1, 0, 1, 1)  # Front face
+        edges = (0, 1, 1, 2, 2, 3, 3, 0,
+                 4, 5, 5, 6, 6, 7, 7, 4,
+                 0, 4, 1, 5, 2, 6, 3, 7)
+        super().__init__(verts, edges, (color,) * 4 + (front,) * 4 + (sides,) * 4)
+
+class Cone(Mesh):  # Apex at origin, base is a unit circle in the plane y == 1
     def __init__(self, color, segments=12):
-        rot = Rotator(2*pi/segments, 0, 1, 0)
-        p0 = Point(1, 1, 0)
-        p1 = p0.copy()
-        orig = Point(0, 0, 0)
-        lines = []
-        for _ in range(segments + 1):
-            p1 @= rot
-            lines.append(Line(p0, p1, color))
-            lines.append(Line(orig, p0, color))
-            p0 @= rot
-        super().__init__(lines)
-
-class Circle(Shape):  # Unit circle in XY plane centred on origin
+        verts = array('f', (0, 0, 0))
+        _ring(verts, 1, segments)
+        edges = array('H')
+        for n in range(1, segments + 1):
+            edges.extend((n, n % segments + 1, 0, n))
+        super().__init__(verts, edges, color)
+
+class Circle(Mesh):  # Unit circle in XZ plane centred on origin
     def __init__(self, color, segments=12):
-        rot = Rotator(2*pi/segments, 0, 1, 0)
-        p0 = Point(1, 0, 0)
-        p1 = p0.copy()
-        lines = []
-        for _ in range(segments + 1):
-            p1 @= rot
-            lines.append(Line(p0, p1, color))
-            p0 @= rot
-        super().__init__(lines)
-
-class Sphere(Shape):  # Unit sphere in XY plane centred on origin
+        verts = array('f')
+        _ring(verts, 0, segments)
+        edges = array('H')
+        for n in range(segments):
+            edges.extend((n, (n + 1) % segments))
+        super().__init__(verts, edges, color)
+
+class Sphere(Mesh):  # Unit sphere centred on origin
     def __init__(self, color, segments=12):
-        lines = []
-        s = Circle(color)
+        c = Circle(color, segments)
         xrot = Rotator(2 * pi / segments, 1, 0, 0)
-        for _ in range(segments / 2 + 1):
-            gc.collect()
-            lines.extend(s.lines[:])
-            s @= xrot
-        super().__init__(lines)
+        ring = c.verts
+        verts = array('f')
+        edges = array('H')
+        for n in range(segments // 2):  # Circles rotated about x through 180°
+            verts.extend(ring)
+            ring = transform_points(xrot, ring, array('f', ring))
+            for e in c.edges:
+                edges.append(e + n * segments)
+        super().__init__(verts, edges, color)
 
 
 # Composition rather than inheritance as MP can't inherit builtin types.
+# Projected lines are cached for each entry. A Shape is reprojected only if the
+# entry is replaced or the camera (.crot or .distance) changes. If erase is
+# True, rather than clearing the display, the old bounding boxes of changed
+# shapes are erased and only shapes in those regions are redrawn.
 class DisplayDict:
-    def __init__(self, ssd, angle, distance):
+    def __init__(self, ssd, angle, distance, erase=False):
+        if erase and fill_rect is None:
+            raise ValueError('Erase mode requires setup3d.fill_rect')
         self.ssd = ssd
         self.distance = distance  # scalar
         # Rotation quaternion for camera view
         self.crot = Rotator(angle, 1, 1, 0)
+        self.erase = erase
         self.d = {}
+        self._cache = {}  # key: [shape, segs, colors, bbox, changed]
+        self._cam = None  # Camera state when cache was filled
+        self._gone = []  # Bounding boxes of deleted shapes
 
     def __setitem__(self, key, value):
         if not isinstance(value, Shape):
@@ -178,13 +456,55 @@ class DisplayDict:
 
     def __delitem__(self, key):
         del self.d[key]
+        c = self._cache.pop(key, None)
+        if c is not None:
+            self._gone.append(c[3])
+
+    # Force reprojection of an entry, or of all entries if key is None. Only
+    # needed if a Shape is modified other than by its operators.
+    def dirty(self, key=None):
+        for k, c in self._cache.items():
+            if key is None or k == key:
+                c[0] = None
 
+    # Update the display. Return False if nothing has changed since the last
+    # call, in which case the display is not refreshed.
     def show(self):
-        ssd = self.ssd
-        fill(0)
+        d = self.d
+        cache = self._cache
         crot = self.crot
         dz = self.distance
-        for shape in self.d.values():
-            s = shape.camera(crot, dz)
-            s.show(ssd)
+        cam = tuple(crot) + (dz,)
+        moved = cam != self._cam  # Camera has moved
+        self._cam = cam
+        erased = self._gone
+        self._gone = []
+        for key in [k for k in cache if k not in d]:  # Deleted from .d directly
+            erased.append(cache.pop(key)[3])
+        changed = moved or bool(erased)
+        for key, shape in d.items():
+            c = cache.get(key)
+            if moved or c is None or c[0] is not shape:
+                if c is not None:
+                    erased.append(c[3])
+                segs, colors = shape.project(crot, dz)
+                cache[key] = [shape, segs, colors, _bbox(segs), True]
+                changed = True
+            else:
+                c[4] = False
+        if not changed:
+            return False
+        gc.collect()  # Once per frame
+        if moved or not self.erase:
+            fill(0)
+            for c in cache.values():
+                _draw(c[1], c[2])
+        else:
+            for b in erased:
+                if b is not None:
+                    fill_rect(b[0], b[1], b[2] - b[0] + 1, b[3] - b[1] + 1, 0)
+            for c in cache.values():
+                if c[4] or any(_overlap(c[3], b) for b in erased):
+                    _draw(c[1], c[2])
         show()
+        return True
@@ -0,0 +1,134 @@
+# graph3d_bench.py Frame rate benchmark for graph3d.DisplayDict.show()
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) 2020 Peter Hinch
+
+# Uses setup3d.py if the target has display hardware, otherwise renders to RAM
+# with setup3d_host.py. Runs under CPython, the Unix build or on a target.
+# python3 graph3d_bench.py
+
+import sys
+from math import pi
+from array import array
+try:
+    import setup3d
+except ImportError:  # No hardware
+    import setup3d_host as setup3d
+    sys.modules['setup3d'] = setup3d
+from quat import Rotator
+import graph3d as g3d
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:  # CPython
+    from time import perf_counter
+
+    def ticks_us():
+        return round(perf_counter() * 1_000_000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+def nlines(dobj):
+    return sum(len(s.edges) // 2 if isinstance(s, g3d.Mesh) else len(s.lines) for s in dobj.d.values())
+
+def ndrawn(dobj):  # Lines visible after clipping in the last frame
+    return sum(len(c[1]) // 4 for c in dobj._cache.values())
+
+# Display the shapes in dobj for nframes, rotating the named shape each frame.
+# If full is True every shape is reprojected each frame, defeating the cache.
+# Return frames per second.
+def frames(dobj, key, nframes, full):
+    rot = Rotator(pi/24, 0, 1, 0)
+    t = ticks_us()
+    for _ in range(nframes):
+        dobj[key] @= rot
+        if full:
+            dobj.dirty()
+        dobj.show()
+    dt = ticks_diff(ticks_us(), t)
+    return nframes * 1_000_000 / dt
+
+# Print and return the frame rates with the cache and with full reprojection.
+def run(name, dobj, key, nframes=50):
+    cached = frames(dobj, key, nframes, False)
+    full = frames(dobj, key, nframes, True)
+    name = '{} erase'.format(name) if dobj.erase else name
+    print('{:22s} {:3d} shapes {:5d} lines {:5d} drawn {:7.1f} fps {:7.1f} fps reprojected'.format(
+          name, len(dobj.d), nlines(dobj), ndrawn(dobj), cached, full))
+    return cached, full
+
+def mixed(ssd, erase=False):
+    dobj = g3d.DisplayDict(ssd, pi/6, 5, erase)
+    dobj['axes'] = g3d.Axes(setup3d.WHITE)
+    dobj['cube'] = g3d.Cube(setup3d.RED, setup3d.BLUE, setup3d.GREEN) * 0.8 - (0.4, 0.4, 0.4)
+    dobj['cone'] = g3d.Cone(setup3d.GREEN) * 0.7
+    dobj['circle'] = g3d.Circle(setup3d.YELLOW) * 0.9
+    dobj['sphere'] = g3d.Sphere(setup3d.CYAN) * 0.5
+    return run('mixed', dobj, 'cube')
+
+def many(ssd, n=5, erase=False):  # n * n small cubes
+    dobj = g3d.DisplayDict(ssd, pi/6, 5, erase)
+    cube = g3d.Cube(setup3d.RED) * 0.2
+    for i in range(n):
+        for j in range(n):
+            dobj[(i, j)] = cube + (0.4 * i - 0.9, 0.4 * j - 0.9, 0)
+    dobj['centre'] = cube
+    return run('many', dobj, 'centre')
+
+# n * n cubes spread over an area much larger than the display: most lines are
+# culled or clipped before drawing.
+def offscreen(ssd, n=5, erase=False, name='offscreen'):
+    dobj = g3d.DisplayDict(ssd, pi/6, 5, erase)
+    cube = g3d.Cube(setup3d.RED) * 0.2
+    for i in range(n):
+        for j in range(n):
+            dobj[(i, j)] = cube + (2.5 * i - 5.1, 2.5 * j - 5.1, 0)
+    dobj['centre'] = cube
+    return run(name, dobj, 'centre')
+
+# Control for the off-screen scene: Mesh._segs without culling or clipping.
+# Every vertex is projected and every edge is drawn, leaving the display driver
+# to discard off-screen pixels. Valid only if all vertices are in front of the
+# camera.
+def unclipped(self):
+    v = self.verts
+    w = g3d.DIMENSION  # Viewing area is square
+    h = w
+    n = len(v) // 3
+    xy = array('h', (0 for _ in range(2 * n)))
+    for i in range(n):
+        z = v[3 * i + 2]
+        xy[2 * i] = round((1 + v[3 * i]/z) * w)
+        xy[2 * i + 1] = round((1 - v[3 * i + 1]/z) * h)
+    e = self.edges
+    segs = array('h', (0 for _ in range(2 * len(e))))
+    for n in range(len(e)):
+        i = 2 * e[n]
+        segs[2 * n] = xy[i]
+        segs[2 * n + 1] = xy[i + 1]
+    return segs, self.colors
+
+# Run the off-screen scene with culling and clipping turned off. Comparing the
+# reprojected frame rates isolates their saving from that of the cache.
+def noclip(ssd, erase=False):
+    segs = g3d.Mesh._segs
+    g3d.Mesh._segs = unclipped
+    try:
+        offscreen(ssd, erase=erase, name='offscreen noclip')
+    finally:
+        g3d.Mesh._segs = segs
+
+def test():
+    ssd = setup3d.setup()
+    mixed(ssd)
+    many(ssd)
+    offscreen(ssd)
+    noclip(ssd)
+    if g3d.fill_rect is not None:
+        mixed(ssd, erase=True)
+        many(ssd, erase=True)
+        offscreen(ssd, erase=True)
+        noclip(ssd, erase=True)
+
+test()
@@ -0,0 +1,261 @@
+# qfusion.py Sensor fusion producing quat.Quaternion orientation from IMU data
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) 2020 Peter Hinch
+
+# Madgwick and Mahony filters after the reference C implementations by
+# Sebastian Madgwick: https://x-io.co.uk/open-source-imu-and-ahrs-algorithms/
+# Samples are passed one at a time or as a batch in an array('f') of records,
+# each record being gx, gy, gz, ax, ay, az and optionally mx, my, mz. Gyro
+# values are in radians/s. Accel and mag values may be in any units. Samples
+# are assumed to be taken at a fixed rate. A batch may be saved to a binary log
+# file and replayed. The filter state is held in a Quaternion which is updated
+# in place: no objects are allocated per sample.
+
+from math import sqrt
+from quat import Quaternion, euler
+
+class _Fusion:
+    def __init__(self, period, q):
+        self.period = period  # Sample interval in secs
+        self.q = Quaternion() if q is None else q
+
+    # Process n records (default all) from an array('f'). Each record has 6
+    # values or 9 if mag is True.
+    def batch(self, buf, n=None, mag=False):
+        stride = 9 if mag else 6
+        n = len(buf) // stride if n is None else n
+        dt = self.period
+        if mag:
+            update = self.update_mag
+            for i in range(0, n * stride, stride):
+                update(buf[i], buf[i + 1], buf[i + 2], buf[i + 3], buf[i + 4], buf[i + 5],
+                       buf[i + 6], buf[i + 7], buf[i + 8], dt)
+        else:
+            update = self.update
+            for i in range(0, n * stride, stride):
+                update(buf[i], buf[i + 1], buf[i + 2], buf[i + 3], buf[i + 4], buf[i + 5], dt)
+        return self.q
+
+    # Read a log file of records (see .batch) and process it in blocks using
+    # the preallocated array buf.
+    def replay(self, fname, buf, mag=False):
+        stride = 9 if mag else 6
+        mv = memoryview(buf)
+        with open(fname, 'rb') as f:
+            while True:
+                nbytes = f.readinto(mv)
+                if not nbytes:
+                    break
+                self.batch(buf, nbytes // (4 * stride), mag)
+        return self.q
+
+    def euler(self):  # Return (heading, pitch, roll) in radians
+        return euler(self.q)
+
+    def _set(self, q0, q1, q2, q3):  # Normalise and update the Quaternion
+        m = 1 / sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+        q = self.q
+        d = q.d
+        d[0] = q0 * m
+        d[1] = q1 * m
+        d[2] = q2 * m
+        d[3] = q3 * m
+        q._m = None  # Invalidate cached rotation matrix
+
+# Gradient descent filter. beta is the gain: higher values correct gyro drift
+# more quickly at the cost of more accel and mag noise.
+class Madgwick(_Fusion):
+    def __init__(self, beta=0.1, period=0.001, q=None):
+        super().__init__(period, q)
+        self.beta = beta
+
+    def update(self, gx, gy, gz, ax, ay, az, dt=None):
+        dt = self.period if dt is None else dt
+        d = self.q.d  # Unpacking an array would allocate an iterator
+        q0 = d[0]
+        q1 = d[1]
+        q2 = d[2]
+        q3 = d[3]
+        # Rate of change of quaternion from gyroscope
+        qd0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
+        qd1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
+        qd2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
+        qd3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+        a = ax * ax + ay * ay + az * az
+        if a > 0:  # Accel data is valid
+            a = 1 / sqrt(a)
+            ax *= a
+            ay *= a
+            az *= a
+            q0q0 = q0 * q0
+            q1q1 = q1 * q1
+            q2q2 = q2 * q2
+            q3q3 = q3 * q3
+            # Gradient descent corrective step
+            s0 = 4 * q0 * q2q2 + 2 * q2 * ax + 4 * q0 * q1q1 - 2 * q1 * ay
+            s1 = 4 * q1 * q3q3 - 2 * q3 * ax + 4 * q0q0 * q1 - 2 * q0 * ay - 4 * q1 + 8 * q1 * q1q1 + 8 * q1 * q2q2 + 4 * q1 * az
+            s2 = 4 * q0q0 * q2 + 2 * q0 * ax + 4 * q2 * q3q3 - 2 * q3 * ay - 4 * q2 + 8 * q2 * q1q1 + 8 * q2 * q2q2 + 4 * q2 * az
+            s3 = 4 * q1q1 * q3 - 2 * q1 * ax + 4 * q2q2 * q3 - 2 * q2 * ay
+            s = s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3
+            if s > 0:
+                s = self.beta / sqrt(s)
+                qd0 -= s * s0
+                qd1 -= s * s1
+                qd2 -= s * s2
+                qd3 -= s * s3
+        self._set(q0 + qd0 * dt, q1 + qd1 * dt, q2 + qd2 * dt, q3 + qd3 * dt)
+
+    def update_mag(self, gx, gy, gz, ax, ay, az, mx, my, mz, dt=None):
+        a = ax * ax + ay * ay + az * az
+        m = mx * mx + my * my + mz * mz
+        if a == 0 or m == 0:  # Mag or accel data is invalid
+            self.update(gx, gy, gz, ax, ay, az, dt)
+            return
+        dt = self.period if dt is None else dt
+        d = self.q.d
+        q0 = d[0]
+        q1 = d[1]
+        q2 = d[2]
+        q3 = d[3]
+        qd0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
+        qd1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
+        qd2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
+        qd3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+        a = 1 / sqrt(a)
+        ax *= a
+        ay *= a
+        az *= a
+        m = 1 / sqrt(m)
+        mx *= m
+        my *= m
+        mz *= m
+        _2q0mx = 2 * q0 * mx
+        _2q0my = 2 * q0 * my
+        _2q0mz = 2 * q0 * mz
+        _2q1mx = 2 * q1 * mx
+        _2q0 = 2 * q0
+        _2q1 = 2 * q1
+        _2q2 = 2 * q2
+        _2q3 = 2 * q3
+        _2q0q2 = 2 * q0 * q2
+        _2q2q3 = 2 * q2 * q3
+        q0q0 = q0 * q0
+        q0q1 = q0 * q1
+        q0q2 = q0 * q2
+        q0q3 = q0 * q3
+        q1q1 = q1 * q1
+        q1q2 = q1 * q2
+        q1q3 = q1 * q3
+        q2q2 = q2 * q2
+        q2q3 = q2 * q3
+        q3q3 = q3 * q3
+        # Reference direction of Earth's magnetic field
+        hx = mx * q0q0 - _2q0my * q3 + _2q0mz * q2 + mx * q1q1 + _2q1 * my * q2 + _2q1 * mz * q3 - mx * q2q2 - mx * q3q3
+        hy = _2q0mx * q3 + my * q0q0 - _2q0mz * q1 + _2q1mx * q2 - my * q1q1 + my * q2q2 + _2q2 * mz * q3 - my * q3q3
+        _2bx = sqrt(hx * hx + hy * hy)
+        _2bz = -_2q0mx * q2 + _2q0my * q1 + mz * q0q0 + _2q1mx * q3 - mz * q1q1 + _2q2 * my * q3 - mz * q2q2 + mz * q3q3
+        _4bx = 2 * _2bx
+        _4bz = 2 * _2bz
+        # Gradient descent corrective step. Common subexpressions are the
+        # errors in the directions of gravity and magnetic field.
+        fa = 2 * q1q3 - _2q0q2 - ax
+        fb = 2 * q0q1 + _2q2q3 - ay
+        fc = 1 - 2 * q1q1 - 2 * q2q2 - az
+        fx = _2bx * (0.5 - q2q2 - q3q3) + _2bz * (q1q3 - q0q2) - mx
+        fy = _2bx * (q1q2 - q0q3) + _2bz * (q0q1 + q2q3) - my
+        fz = _2bx * (q0q2 + q1q3) + _2bz * (0.5 - q1q1 - q2q2) - mz
+        s0 = -_2q2 * fa + _2q1 * fb - _2bz * q2 * fx + (-_2bx * q3 + _2bz * q1) * fy + _2bx * q2 * fz
+        s1 = _2q3 * fa + _2q0 * fb - 4 * q1 * fc + _2bz * q3 * fx + (_2bx * q2 + _2bz * q0) * fy + (_2bx * q3 - _4bz * q1) * fz
+        s2 = -_2q0 * fa + _2q3 * fb - 4 * q2 * fc + (-_4bx * q2 - _2bz * q0) * fx + (_2bx * q1 + _2bz * q3) * fy + (_2bx * q0 - _4bz * q2) * fz
+        s3 = _2q1 * fa + _2q2 * fb + (-_4bx * q3 + _2bz * q1) * fx + (-_2bx * q0 + _2bz * q2) * fy + _2bx * q1 * fz
+        s = s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3
+        if s > 0:
+            s = self.beta / sqrt(s)
+            qd0 -= s * s0
+            qd1 -= s * s1
+            qd2 -= s * s2
+            qd3 -= s * s3
+        self._set(q0 + qd0 * dt, q1 + qd1 * dt, q2 + qd2 * dt, q3 + qd3 * dt)
+
+# Complementary filter with proportional and integral feedback. kp and ki are
+# the gains. ki > 0 allows gyro bias to be corrected.
+class Mahony(_Fusion):
+    def __init__(self, kp=1.0, ki=0.0, period=0.001, q=None):
+        super().__init__(period, q)
+        self.kp = kp
+        self.ki = ki
+        self.ix = 0.0  # Integral error terms
+        self.iy = 0.0
+        self.iz = 0.0
+
+    def update(self, gx, gy, gz, ax, ay, az, dt=None):
+        self.update_mag(gx, gy, gz, ax, ay, az, 0, 0, 0, dt)
+
+    def update_mag(self, gx, gy, gz, ax, ay, az, mx, my, mz, dt=None):
+        dt = self.period if dt is None else dt
+        d = self.q.d
+        q0 = d[0]
+        q1 = d[1]
+        q2 = d[2]
+        q3 = d[3]
+        a = ax * ax + ay * ay + az * az
+        if a > 0:  # Accel data is valid
+            a = 1 / sqrt(a)
+            ax *= a
+            ay *= a
+            az *= a
+            q0q1 = q0 * q1
+            q0q2 = q0 * q2
+            q1q3 = q1 * q3
+            q2q3 = q2 * q3
+            # Estimated direction of gravity. Error is cross product with measured.
+            vx = q1q3 - q0q2
+            vy = q0q1 + q2q3
+            vz = q0 * q0 - 0.5 + q3 * q3
+            ex = ay * vz - az * vy
+            ey = az * vx - ax * vz
+            ez = ax * vy - ay * vx
+            m = mx * mx + my * my + mz * mz
+            if m > 0:  # Mag data is valid
+                m = 1 / sqrt(m)
+                mx *= m
+                my *= m
+                mz *= m
+                q0q3 = q0 * q3
+                q1q1 = q1 * q1
+                q1q2 = q1 * q2
+                q2q2 = q2 * q2
+                q3q3 = q3 * q3
+                # Reference direction of Earth's magnetic field
+                hx = 2 * (mx * (0.5 - q2q2 - q3q3) + my * (q1q2 - q0q3) + mz * (q1q3 + q0q2))
+                hy = 2 * (mx * (q1q2 + q0q3) + my * (0.5 - q1q1 - q3q3) + mz * (q2q3 - q0q1))
+                bx = sqrt(hx * hx + hy * hy)
+                bz = 2 * (mx * (q1q3 - q0q2) + my * (q2q3 + q0q1) + mz * (0.5 - q1q1 - q2q2))
+                # Estimated direction of magnetic field
+                wx = bx * (0.5 - q2q2 - q3q3) + bz * (q1q3 - q0q2)
+                wy = bx * (q1q2 - q0q3) + bz * (q0q1 + q2q3)
+                wz = bx * (q0q2 + q1q3) + bz * (0.5 - q1q1 - q2q2)
+                ex += my * wz - mz * wy
+                ey += mz * wx - mx * wz
+                ez += mx * wy - my * wx
+            if self.ki > 0:
+                k = 2 * self.ki * dt
+                self.ix += k * ex
+                self.iy += k * ey
+                self.iz += k * ez
+                gx += self.ix
+                gy += self.iy
+                gz += self.iz
+            k = 2 * self.kp
+            gx += k * ex
+            gy += k * ey
+            gz += k * ez
+        dt *= 0.5
+        gx *= dt
+        gy *= dt
+        gz *= dt
+        self._set(q0 - q1 * gx - q2 * gy - q3 * gz,
+                  q1 + q0 * gx + q2 * gz - q3 * gy,
+                  q2 + q0 * gy - q1 * gz + q3 * gx,
+                  q3 + q0 * gz + q1 * gy - q2 * gx)
@@ -0,0 +1,69 @@
+# qfusion_test.py Test for qfusion.py using synthetic IMU data
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) 2020 Peter Hinch
+
+import os
+from math import isclose, pi
+from array import array
+from quat import *
+from qfusion import Madgwick, Mahony
+
+# Sensor orientation relative to Earth. Synthetic accel and mag readings are
+# the Earth's gravity and field vectors in the sensor frame.
+r = Euler(0.5, 0.3, -0.4)
+g = Vector(0, 0, 1) @ r.conjugate()
+m = Vector(0.4, 0, -0.8) @ r.conjugate()
+still = array('f', (0, 0, 0, g.x, g.y, g.z, m.x, m.y, m.z) * 100)
+
+def check(a, b, tol=0.001):
+    for x, y in zip(a, b):
+        assert isclose(x, y, abs_tol=tol)
+
+for f in (Madgwick(0.5, 0.01), Mahony(5, 0, 0.01)):
+    name = f.__class__.__name__
+    print(name, 'gyro integration')
+    f.beta = 0
+    f.kp = 0
+    q = f.q
+    for _ in range(100):  # 1s at 1 rad/s about z
+        f.update(0, 0, 1, 0, 0, 0)
+    assert f.q is q  # Updated in place
+    check(f.euler(), (1, 0, 0))
+    q[:] = (1, 0, 0, 0)
+    f.batch(array('f', (0, 0, pi/2, 0, 0, 0) * 100), 50)  # Half the records
+    check(f.euler(), (pi/4, 0, 0))
+
+    print(name, 'convergence from accel and mag')
+    f.beta = 0.5
+    f.kp = 5
+    q[:] = (1, 0, 0, 0)
+    m0 = q.to_matrix()
+    for _ in range(20):
+        f.batch(still, mag=True)
+    check(f.euler(), euler(r))
+    assert q.to_matrix() is not m0  # Cache was invalidated
+    check(Vector(*g[1:]) @ q, (0, 0, 0, 1))
+
+    print(name, 'accel only corrects pitch and roll')
+    q[:] = (1, 0, 0, 0)
+    buf = array('f', (0, 0, 0, g.x, g.y, g.z) * 100)
+    for _ in range(20):
+        f.batch(buf)
+    check(Vector(*g[1:]) @ q, (0, 0, 0, 1), 0.01)  # Madgwick step is beta * dt
+
+    print(name, 'log file replay')
+    fname = 'qfusion_test.bin'
+    with open(fname, 'wb') as fp:
+        for _ in range(20):
+            fp.write(still)
+    q[:] = (1, 0, 0, 0)
+    f.replay(fname, array('f', (0 for _ in range(9 * 64))), mag=True)
+    e = f.euler()
+    q[:] = (1, 0, 0, 0)
+    for _ in range(20):
+        f.batch(still, mag=True)
+    check(e, f.euler(), 1e-6)
+    os.remove(fname)
+
+print('*** All tests PASSED. ***')
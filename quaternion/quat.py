@@ -18,6 +18,10 @@ def _arglen(arg):
         raise ValueError('Sequence length must be 3 or 4')
     return length
 
+def _close(a, b):  # As isclose(a, b, rel_tol=mdelta, abs_tol=adelta)
+    d = abs(a - b)
+    return d <= adelta or d <= mdelta * max(abs(a), abs(b))
+
 # Convert a rotation quaternion to Euler angles. Beware:
 # https://github.com/moble/quaternion/wiki/Euler-angles-are-horrible
 def euler(q):  # Return (heading, pitch, roll)
@@ -40,6 +44,7 @@ class Quaternion:
 
     def __init__(self, w=1, x=0, y=0, z=0):  # Default: the identity quaternion
         self.d = array('f', (w, x, y, z))
+        self._m = None  # Cached rotation matrix. See .to_matrix()
 
     @property
     def w(self):
@@ -91,6 +96,7 @@ class Quaternion:
         except TypeError:  # Scalar
             v1 = v
         self.d[key] = v1
+        self._m = None
 
     def copy(self):
         return Quaternion(*self)
@@ -145,7 +151,7 @@ class Quaternion:
         return Quaternion(*(-a for a in self))
 
     def __truediv__(self, scalar):
-        if isinstance(scalar, Quaternion):  # See docs for reason
+        if isinstance(scalar, (Quaternion, FastQuaternion)):  # See docs for reason
             raise ValueError('Cannot divide by Quaternion')
         return Quaternion(*(a/scalar for a in self))
 
@@ -154,7 +160,7 @@ class Quaternion:
 
     # Multiply by quaternion, list, tuple, or scalar: result = self * other
     def __mul__(self, other):
-        if isinstance(other, Quaternion):
+        if isinstance(other, (Quaternion, FastQuaternion)):
             w1, x1, y1, z1 = self
             w2, x2, y2, z2 = other
             w = w1*w2 - x1*x2 - y1*y2 - z1*z2
@@ -213,6 +219,326 @@ class Quaternion:
     def rrot(self, rot):
         return rot.conjugate() * self * rot
 
+    # In-place operations modify the instance and return it. They avoid the
+    # allocation of new Quaternion instances in loops.
+    def imul(self, other):  # self = self * other
+        self._m = None
+        d = self.d
+        if isinstance(other, (Quaternion, FastQuaternion)):
+            w1, x1, y1, z1 = d
+            w2, x2, y2, z2 = other.d if isinstance(other, Quaternion) else other
+            d[0] = w1*w2 - x1*x2 - y1*y2 - z1*z2
+            d[1] = w1*x2 + x1*w2 + y1*z2 - z1*y2
+            d[2] = w1*y2 - x1*z2 + y1*w2 + z1*x2
+            d[3] = w1*z2 + x1*y2 - y1*x2 + z1*w2
+            return self
+        length = _arglen(other)
+        if length == 0:  # Assume other is scalar
+            for i in range(4):
+                d[i] *= other
+        elif length == 3:
+            d[0] = 0
+            for i in range(3):
+                d[i + 1] *= other[i]
+        else:  # length == 4
+            for i in range(4):
+                d[i] *= other[i]
+        return self
+
+    def iadd(self, other):  # self = self + other
+        self._m = None
+        d = self.d
+        length = 4 if isinstance(other, (Quaternion, FastQuaternion)) else _arglen(other)
+        if length == 0:  # Assume other is scalar
+            d[0] += other
+        elif length == 3:
+            d[0] = 0
+            for i in range(3):
+                d[i + 1] += other[i]
+        else:  # length == 4
+            for i in range(4):
+                d[i] += other[i]
+        return self
+
+    def rotate_inplace(self, rot):  # self = self @ rot
+        self._m = None
+        d = self.d
+        w1, x1, y1, z1 = rot.d if isinstance(rot, Quaternion) else rot
+        w2, x2, y2, z2 = d
+        # t = rot * self
+        tw = w1*w2 - x1*x2 - y1*y2 - z1*z2
+        tx = w1*x2 + x1*w2 + y1*z2 - z1*y2
+        ty = w1*y2 - x1*z2 + y1*w2 + z1*x2
+        tz = w1*z2 + x1*y2 - y1*x2 + z1*w2
+        # self = t * rot.conjugate()
+        d[0] = tw*w1 + tx*x1 + ty*y1 + tz*z1
+        d[1] = -tw*x1 + tx*w1 - ty*z1 + tz*y1
+        d[2] = -tw*y1 + tx*z1 + ty*w1 - tz*x1
+        d[3] = -tw*z1 - tx*y1 + ty*x1 + tz*w1
+        return self
+
+    def normalise_inplace(self):  # As per normalise
+        self._m = None
+        d = self.d
+        if d[0] == 1:  # Identity quaternion: no rotation
+            d[1] = d[2] = d[3] = 0
+            return self
+        m = abs(self)  # Magnitude
+        assert m > 0.1  # rotation quaternion should have magnitude ~= 1
+        if not isclose(m, 1.0, rel_tol=mdelta):
+            for i in range(4):
+                d[i] /= m
+        return self
+
+    # Return a 3x3 matrix, as an array('f') in row order, which rotates a point
+    # as per point @ self. The matrix is cached until the instance is changed.
+    # Changes made directly to .d are not detected.
+    def to_matrix(self):
+        if self._m is None:
+            w, x, y, z = self.d
+            ww = w*w; xx = x*x; yy = y*y; zz = z*z
+            self._m = array('f', (ww + xx - yy - zz, 2*(x*y - w*z), 2*(x*z + w*y),
+                                  2*(x*y + w*z), ww - xx + yy - zz, 2*(y*z - w*x),
+                                  2*(x*z - w*y), 2*(y*z + w*x), ww - xx - yy + zz))
+        return self._m
+
+    __imul__ = imul
+    __iadd__ = iadd
+    __imatmul__ = rotate_inplace
+
+# A Quaternion with the same API, storing components in plain attributes rather
+# than an array. Component access and arithmetic are faster at the cost of more
+# RAM per instance. On CPython __slots__ reduces this; MicroPython ignores it.
+# Convert with FastQuaternion(*q) and .to_quaternion(). .to_matrix() is not
+# cached as changes to attributes can't be detected.
+class FastQuaternion:
+    __slots__ = ('w', 'x', 'y', 'z')
+
+    def __init__(self, w=1, x=0, y=0, z=0):  # Default: the identity quaternion
+        self.w = w
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def to_quaternion(self):
+        return Quaternion(self.w, self.x, self.y, self.z)
+
+    def normalise(self):
+        if self.w == 1:  # Identity quaternion: no rotation
+            return FastQuaternion(1, 0, 0, 0)
+        m = abs(self)  # Magnitude
+        assert m > 0.1  # rotation quaternion should have magnitude ~= 1
+        if isclose(m, 1.0, rel_tol=mdelta):
+            return self  # No normalisation necessary
+        return FastQuaternion(self.w / m, self.x / m, self.y / m, self.z / m)
+
+    def __getitem__(self, key):  # A slice returns a tuple
+        return (self.w, self.x, self.y, self.z)[key]
+
+    def __setitem__(self, key, v):
+        l = [self.w, self.x, self.y, self.z]
+        l[key] = v
+        if len(l) != 4:
+            raise ValueError('Slice assignment must not change length')
+        self.w, self.x, self.y, self.z = l
+
+    def __iter__(self):
+        return iter((self.w, self.x, self.y, self.z))
+
+    def copy(self):
+        return FastQuaternion(self.w, self.x, self.y, self.z)
+
+    def __abs__(self):  # Return magnitude
+        return sqrt(self.w * self.w + self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def __len__(self):
+        return 4
+    # Comparisons are as per Quaternion
+    def __eq__(self, other):
+        if isinstance(other, FastQuaternion):
+            w = other.w; x = other.x; y = other.y; z = other.z
+        else:
+            w, x, y, z = other
+        return (_close(self.w, w) and _close(self.x, x)
+                and _close(self.y, y) and _close(self.z, z))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __gt__(self, other):
+        return abs(self) > abs(other)
+
+    def __lt__(self, other):
+        return abs(self) < abs(other)
+
+    def __ge__(self, other):
+        return True if self == other else abs(self) > abs(other)
+
+    def __le__(self, other):
+        return True if self == other else abs(self) < abs(other)
+
+    def to_angle_axis(self):
+        q = self.normalise()
+        if isclose(q.w, 1.0, rel_tol = mdelta):
+            return 0, 1, 0, 0
+        theta = 2*acos(q.w)
+        s = sin(theta/2)
+        return [theta, q.x / s, q.y / s, q.z / s]
+
+    def conjugate(self):
+        return FastQuaternion(self.w, -self.x, -self.y, -self.z)
+
+    def inverse(self):  # Reciprocal
+        n = self.w * self.w + self.x * self.x + self.y * self.y + self.z * self.z
+        return FastQuaternion(self.w / n, -self.x / n, -self.y / n, -self.z / n)
+
+    def __str__(self):
+        return 'w = {:4.2f} x = {:4.2f} y = {:4.2f} z = {:4.2f}'.format(self.w, self.x, self.y, self.z)
+
+    def __pos__(self):
+        return self.copy()
+
+    def __neg__(self):
+        return FastQuaternion(-self.w, -self.x, -self.y, -self.z)
+
+    def __truediv__(self, scalar):
+        if isinstance(scalar, (Quaternion, FastQuaternion)):  # See docs for reason
+            raise ValueError('Cannot divide by Quaternion')
+        return FastQuaternion(self.w / scalar, self.x / scalar, self.y / scalar, self.z / scalar)
+
+    def __rtruediv__(self, other):
+        return self.inverse() * other
+
+    # Multiply by quaternion, list, tuple, or scalar: result = self * other
+    def __mul__(self, other):
+        if isinstance(other, FastQuaternion):
+            w2 = other.w; x2 = other.x; y2 = other.y; z2 = other.z
+        elif isinstance(other, Quaternion):
+            w2, x2, y2, z2 = other.d
+        elif isinstance(other, (int, float)):
+            return FastQuaternion(self.w * other, self.x * other, self.y * other, self.z * other)
+        elif _arglen(other) == 3:
+            return FastQuaternion(0, self.x * other[0], self.y * other[1], self.z * other[2])
+        else:  # length == 4
+            return FastQuaternion(self.w * other[0], self.x * other[1], self.y * other[2], self.z * other[3])
+        w1 = self.w; x1 = self.x; y1 = self.y; z1 = self.z
+        return FastQuaternion(w1*w2 - x1*x2 - y1*y2 - z1*z2,
+                              w1*x2 + x1*w2 + y1*z2 - z1*y2,
+                              w1*y2 - x1*z2 + y1*w2 + z1*x2,
+                              w1*z2 + x1*y2 - y1*x2 + z1*w2)
+
+    def __rmul__(self, other):
+        return self * other  # Multiplication by scalars and tuples is commutative
+
+    def __add__(self, other):
+        if isinstance(other, FastQuaternion):
+            return FastQuaternion(self.w + other.w, self.x + other.x, self.y + other.y, self.z + other.z)
+        if isinstance(other, (int, float)):
+            return FastQuaternion(self.w + other, self.x, self.y, self.z)
+        if _arglen(other) == 3:
+            return FastQuaternion(0, self.x + other[0], self.y + other[1], self.z + other[2])
+        w, x, y, z = other
+        return FastQuaternion(self.w + w, self.x + x, self.y + y, self.z + z)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        if isinstance(other, FastQuaternion):
+            return FastQuaternion(self.w - other.w, self.x - other.x, self.y - other.y, self.z - other.z)
+        if isinstance(other, (int, float)):
+            return FastQuaternion(self.w - other, self.x, self.y, self.z)
+        if _arglen(other) == 3:
+            return FastQuaternion(0, self.x - other[0], self.y - other[1], self.z - other[2])
+        w, x, y, z = other
+        return FastQuaternion(self.w - w, self.x - x, self.y - y, self.z - z)
+
+    def __rsub__(self, other):
+        return other + self.__neg__()  # via __radd__
+
+    def isrot(self):
+        return isclose(abs(self), 1.0, rel_tol = mdelta)
+
+    def isvec(self):
+        return isclose(self.w, 0, abs_tol = adelta)
+
+    def __matmul__(self, rot):
+        return rot * self * rot.conjugate()
+
+    def rrot(self, rot):
+        return rot.conjugate() * self * rot
+
+    # In-place operations as per Quaternion
+    def imul(self, other):  # self = self * other
+        if isinstance(other, FastQuaternion):
+            w2 = other.w; x2 = other.x; y2 = other.y; z2 = other.z
+        elif isinstance(other, Quaternion):
+            w2, x2, y2, z2 = other.d
+        elif isinstance(other, (int, float)):
+            self.w *= other; self.x *= other; self.y *= other; self.z *= other
+            return self
+        elif _arglen(other) == 3:
+            self.w = 0; self.x *= other[0]; self.y *= other[1]; self.z *= other[2]
+            return self
+        else:  # length == 4
+            self.w *= other[0]; self.x *= other[1]; self.y *= other[2]; self.z *= other[3]
+            return self
+        w1 = self.w; x1 = self.x; y1 = self.y; z1 = self.z
+        self.w = w1*w2 - x1*x2 - y1*y2 - z1*z2
+        self.x = w1*x2 + x1*w2 + y1*z2 - z1*y2
+        self.y = w1*y2 - x1*z2 + y1*w2 + z1*x2
+        self.z = w1*z2 + x1*y2 - y1*x2 + z1*w2
+        return self
+
+    def iadd(self, other):  # self = self + other
+        if isinstance(other, (int, float)):
+            self.w += other
+        elif not isinstance(other, (Quaternion, FastQuaternion)) and _arglen(other) == 3:
+            self.w = 0; self.x += other[0]; self.y += other[1]; self.z += other[2]
+        else:
+            w, x, y, z = other
+            self.w += w; self.x += x; self.y += y; self.z += z
+        return self
+
+    def rotate_inplace(self, rot):  # self = self @ rot
+        if isinstance(rot, FastQuaternion):
+            w1 = rot.w; x1 = rot.x; y1 = rot.y; z1 = rot.z
+        else:
+            w1, x1, y1, z1 = rot
+        w2 = self.w; x2 = self.x; y2 = self.y; z2 = self.z
+        # t = rot * self
+        tw = w1*w2 - x1*x2 - y1*y2 - z1*z2
+        tx = w1*x2 + x1*w2 + y1*z2 - z1*y2
+        ty = w1*y2 - x1*z2 + y1*w2 + z1*x2
+        tz = w1*z2 + x1*y2 - y1*x2 + z1*w2
+        # self = t * rot.conjugate()
+        self.w = tw*w1 + tx*x1 + ty*y1 + tz*z1
+        self.x = -tw*x1 + tx*w1 - ty*z1 + tz*y1
+        self.y = -tw*y1 + tx*z1 + ty*w1 - tz*x1
+        self.z = -tw*z1 - tx*y1 + ty*x1 + tz*w1
+        return self
+
+    def normalise_inplace(self):  # As per normalise
+        if self.w == 1:  # Identity quaternion: no rotation
+            self.x = self.y = self.z = 0
+            return self
+        m = abs(self)  # Magnitude
+        assert m > 0.1  # rotation quaternion should have magnitude ~= 1
+        if not isclose(m, 1.0, rel_tol=mdelta):
+            self.w /= m; self.x /= m; self.y /= m; self.z /= m
+        return self
+
+    def to_matrix(self):  # As per Quaternion but not cached
+        w = self.w; x = self.x; y = self.y; z = self.z
+        ww = w*w; xx = x*x; yy = y*y; zz = z*z
+        return array('f', (ww + xx - yy - zz, 2*(x*y - w*z), 2*(x*z + w*y),
+                           2*(x*y + w*z), ww - xx + yy - zz, 2*(y*z - w*x),
+                           2*(x*z - w*y), 2*(y*z + w*x), ww - xx - yy + zz))
+
+    __imul__ = imul
+    __iadd__ = iadd
+    __imatmul__ = rotate_inplace
+
 # A vector quaternion has real part 0. It can represent a point in space.
 def Vector(x, y, z):
     return Quaternion(0, x, y, z)
@@ -241,3 +567,178 @@ def Euler(heading, pitch, roll):
     y = cr * sp * cy + sr * cp * sy;
     z = cr * cp * sy - sr * sp * cy;
     return Quaternion(w, x, y, z)  # Tait-Bryan angles but z == towards sky
+
+# N quaternions stored in a single array('f'). Methods operate on all elements
+# writing to a preallocated output (default self), avoiding the allocation of
+# Quaternion instances. Elements may be accessed as Quaternion instances, but
+# this does allocate.
+class QuaternionArray:
+
+    def __init__(self, n=0, data=None):  # data: optional iterable of 4n floats
+        self.d = array('f', (0 for _ in range(4 * n)) if data is None else data)
+        if len(self.d) % 4:
+            raise ValueError('Data length must be a multiple of 4')
+
+    def __len__(self):
+        return len(self.d) // 4
+
+    def __getitem__(self, idx):
+        i = 4 * idx
+        d = self.d
+        return Quaternion(d[i], d[i + 1], d[i + 2], d[i + 3])
+
+    def __setitem__(self, idx, q):  # q is a Quaternion or 4-sequence
+        i = 4 * idx
+        d = self.d
+        d[i], d[i + 1], d[i + 2], d[i + 3] = q
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def _out(self, out):
+        if out is None:
+            return self
+        if len(out) != len(self):
+            raise ValueError('Output length must match')
+        return out
+
+    # Hamilton product of each element with a Quaternion or with the
+    # corresponding element of another QuaternionArray: out[n] = self[n] * other
+    def mul(self, other, out=None):
+        out = self._out(out)
+        d = self.d
+        o = out.d
+        if isinstance(other, QuaternionArray):
+            if len(other) != len(self):
+                raise ValueError('Array lengths must match')
+            e = other.d
+        else:
+            e = None
+            w2, x2, y2, z2 = other
+        for i in range(0, len(d), 4):
+            w1 = d[i]; x1 = d[i + 1]; y1 = d[i + 2]; z1 = d[i + 3]
+            if e is not None:
+                w2 = e[i]; x2 = e[i + 1]; y2 = e[i + 2]; z2 = e[i + 3]
+            o[i] = w1*w2 - x1*x2 - y1*y2 - z1*z2
+            o[i + 1] = w1*x2 + x1*w2 + y1*z2 - z1*y2
+            o[i + 2] = w1*y2 - x1*z2 + y1*w2 + z1*x2
+            o[i + 3] = w1*z2 + x1*y2 - y1*x2 + z1*w2
+        return out
+
+    def conjugate(self, out=None):
+        out = self._out(out)
+        d = self.d
+        o = out.d
+        for i in range(0, len(d), 4):
+            o[i] = d[i]
+            o[i + 1] = -d[i + 1]
+            o[i + 2] = -d[i + 2]
+            o[i + 3] = -d[i + 3]
+        return out
+
+    def normalise(self, out=None):  # Elements with zero magnitude are unchanged
+        out = self._out(out)
+        d = self.d
+        o = out.d
+        for i in range(0, len(d), 4):
+            m = sqrt(d[i]*d[i] + d[i + 1]*d[i + 1] + d[i + 2]*d[i + 2] + d[i + 3]*d[i + 3])
+            m = 1 / m if m > 0 else 1
+            o[i] = d[i] * m
+            o[i + 1] = d[i + 1] * m
+            o[i + 2] = d[i + 2] * m
+            o[i + 3] = d[i + 3] * m
+        return out
+
+    # Rotate each element, treated as a Point, by a rotation quaternion:
+    # out[n] = self[n] @ rot. Uses rot.to_matrix().
+    def rotate_points(self, rot, out=None):
+        out = self._out(out)
+        transform_points(rot, self.d, out.d, 4)
+        o = out.d
+        for i in range(0, len(o), 4):
+            o[i] = 0
+        return out
+
+# Apply the rotation matrix of a Quaternion (see .to_matrix()) to a flat array
+# of coordinates. Each group of stride elements ends with x, y, z: stride is 3
+# for an array of x, y, z triples, or 4 for the .d array of a QuaternionArray.
+# Other elements are not altered. dst defaults to src.
+def transform_points(rot, src, dst=None, stride=3):
+    m00, m01, m02, m10, m11, m12, m20, m21, m22 = rot.to_matrix()
+    if dst is None:
+        dst = src
+    for i in range(stride - 3, len(src), stride):
+        px = src[i]; py = src[i + 1]; pz = src[i + 2]
+        dst[i] = m00*px + m01*py + m02*pz
+        dst[i + 1] = m10*px + m11*py + m12*pz
+        dst[i + 2] = m20*px + m21*py + m22*pz
+    return dst
+
+# Interpolate between rotation quaternions q0 and q1. The angle between them and
+# 1/sin(angle) are computed once: each step then costs two sin() calls. Where
+# the angle is below small (radians) normalised linear interpolation (nlerp) is
+# used: this avoids trig and the division by a sin() near 0.
+class Interpolator:
+
+    def __init__(self, q0, q1, small=0.01):
+        w0, x0, y0, z0 = q0
+        w1, x1, y1, z1 = q1
+        c = w0*w1 + x0*x1 + y0*y1 + z0*z1  # cos(theta)
+        if c < 0:  # q1 and -q1 are the same rotation: take the shorter path
+            w1, x1, y1, z1 = -w1, -x1, -y1, -z1
+            c = -c
+        self.q0 = (w0, x0, y0, z0)
+        self.q1 = (w1, x1, y1, z1)
+        self.theta = acos(min(c, 1))
+        self.rs = 0 if self.theta < small else 1 / sin(self.theta)  # 0: nlerp
+
+    # Return the rotation at t (0 <= t <= 1). If a Quaternion q is passed it is
+    # updated in place, otherwise a new one is created.
+    def at(self, t, q=None):
+        w0, x0, y0, z0 = self.q0
+        w1, x1, y1, z1 = self.q1
+        if self.rs:
+            a = sin((1 - t) * self.theta) * self.rs
+            b = sin(t * self.theta) * self.rs
+        else:
+            b = t
+            a = 1 - t
+        w = a*w0 + b*w1
+        x = a*x0 + b*x1
+        y = a*y0 + b*y1
+        z = a*z0 + b*z1
+        if not self.rs:
+            m = 1 / sqrt(w*w + x*x + y*y + z*z)
+            w *= m; x *= m; y *= m; z *= m
+        if q is None:
+            return Quaternion(w, x, y, z)
+        q._m = None
+        d = q.d
+        d[0] = w; d[1] = x; d[2] = y; d[3] = z
+        return q
+
+    # Fill a QuaternionArray with len(out) rotations evenly spaced from t0 to t1
+    # inclusive.
+    def fill(self, out, t0=0, t1=1):
+        n = len(out)
+        dt = (t1 - t0) / (n - 1) if n > 1 else 0
+        q = Quaternion()
+        e = q.d
+        d = out.d
+        for i in range(0, 4 * n, 4):
+            self.at(t0 + i * dt / 4, q)
+            d[i] = e[0]; d[i + 1] = e[1]; d[i + 2] = e[2]; d[i + 3] = e[3]
+        return out
+
+    # Generator yielding n rotations from q0 to q1 inclusive. If a Quaternion q
+    # is passed it is updated and yielded at each step.
+    def steps(self, n, q=None):
+        dt = 1 / (n - 1) if n > 1 else 0
+        for i in range(n):
+            yield self.at(i * dt if i < n - 1 else 1, q)
+
+# Spherical linear interpolation: return the rotation a fraction t of the way
+# from q0 to q1. Use an Interpolator to produce several rotations from one pair.
+def slerp(q0, q1, t):
+    return Interpolator(q0, q1).at(t)
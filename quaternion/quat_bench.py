@@ -0,0 +1,75 @@
+# quat_bench.py Per operation cost of Quaternion and FastQuaternion
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) 2020 Peter Hinch
+
+# Runs under CPython, the Unix build or on a target.
+# python3 quat_bench.py
+
+from quat import Quaternion, FastQuaternion, Rotator, Vector
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:  # CPython
+    from time import perf_counter
+
+    def ticks_us():
+        return round(perf_counter() * 1_000_000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+# Return a list of (name, function) for operations on instances of class Q.
+def ops(Q):
+    a = Q(1, 2, 3, 4)
+    b = Q(5, 6, 7, 8)
+    r = Q(*Rotator(1, 1, 1, 1))
+    p = Q(*Vector(1, 2, 3))
+    c = r.copy()  # Altered in place
+    v = p.copy()
+
+    def setx():
+        a.x = 2
+
+    def imatmul():
+        v.rotate_inplace(r)
+
+    return [('construct', lambda: Q(1, 2, 3, 4)),
+            ('read .x', lambda: a.x),
+            ('write .x', setx),
+            ('a[1]', lambda: a[1]),
+            ('a * b', lambda: a * b),
+            ('a * 2', lambda: a * 2),
+            ('a + b', lambda: a + b),
+            ('a == b', lambda: a == b),
+            ('abs(a)', lambda: abs(a)),
+            ('conjugate()', lambda: a.conjugate()),
+            ('normalise()', lambda: r.normalise()),
+            ('p @ r', lambda: p @ r),
+            ('c.imul(r)', lambda: c.imul(r)),
+            ('p @= r', imatmul),
+            ('copy().to_matrix()', lambda: r.copy().to_matrix()),
+           ]
+
+# Return the time in μs for n calls of func: the best of three runs.
+def timeit(func, n):
+    best = None
+    for _ in range(3):
+        t = ticks_us()
+        for _ in range(n):
+            func()
+        dt = ticks_diff(ticks_us(), t)
+        best = dt if best is None else min(best, dt)
+    return best
+
+def test(n=1000):
+    empty = timeit(lambda: None, n)  # Loop and call overhead
+    slow = ops(Quaternion)
+    fast = ops(FastQuaternion)
+    print('{:18s} {:>10s} {:>14s} {:>6s}'.format('μs per op', 'Quaternion', 'FastQuaternion', 'ratio'))
+    for (name, fs), (_, ff) in zip(slow, fast):
+        ts = max(timeit(fs, n) - empty, 0) / n
+        tf = max(timeit(ff, n) - empty, 0) / n
+        print('{:18s} {:10.3f} {:14.3f} {:6.1f}'.format(name, ts, tf, ts / tf if tf else 0))
+
+test()
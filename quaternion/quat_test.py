@@ -4,6 +4,7 @@
 # Copyright (c) 2020 Peter Hinch
 
 from math import sin, cos, isclose, pi, sqrt
+from array import array
 from quat import *
 
 print('Properties')
@@ -179,6 +180,145 @@ assert isclose(t[0], 1, rel_tol=mdelta)
 for v in t[1:]:
     assert isclose(v, sqrt(1/3), rel_tol=mdelta)
 
+print('In-place operations')
+q1 = Quaternion(1, 2, 3, 4)
+q2 = Quaternion(5, 6, 7, 8)
+q = q1.copy()
+assert q.imul(q2) is q and q == q1 * q2
+q = q1.copy()
+q *= q2
+assert q == q1 * q2
+for other in (2, (2, 3, 4), (4, 5, 6, 7)):
+    assert q1.copy().imul(other) == q1 * other
+    assert q1.copy().iadd(other) == q1 + other
+q = q1.copy()
+assert q.imul(q) == q1 * q1  # Operand may be self
+q = q1.copy()
+q += q2
+assert q == q1 + q2
+p = Vector(1, 2, 3)
+r = Rotator(1, 1, 1, 1)
+q = p.copy()
+q @= r
+assert q == p @ r
+assert p.copy().rotate_inplace(q1) == p @ q1  # Non-unit quaternion
+q = q1.copy()
+assert q.normalise_inplace() is q and q == q1.normalise()
+assert Quaternion(1, 0.5, 0, 0).normalise_inplace() == Quaternion(1, 0, 0, 0)
+
+print('to_matrix() and transform_points()')
+r = Rotator(1, 1, 2, 3)
+m = r.to_matrix()
+assert r.to_matrix() is m  # Cached
+pts = array('f', (1, 2, 3, -1, 0.5, 0))
+out = transform_points(r, pts, array('f', pts))
+for n in range(0, len(pts), 3):
+    assert Vector(*out[n : n + 3]) == Vector(*pts[n : n + 3]) @ r
+q = Quaternion(1, 2, 3, 4)  # Non-unit
+out = transform_points(q, pts, array('f', pts))
+assert Vector(*out[:3]) == Vector(*pts[:3]) @ q
+m = q.to_matrix()
+q[1] = 5  # Invalidate cache
+assert q.to_matrix() is not m
+assert Vector(*transform_points(q, array('f', (1, 2, 3)))) == Vector(1, 2, 3) @ q
+
+print('QuaternionArray')
+qa = QuaternionArray(3)
+assert len(qa) == 3 and qa[2] == Quaternion(0, 0, 0, 0)
+qa[0] = Quaternion(1, 2, 3, 4)
+qa[1] = (5, 6, 7, 8)
+qa[2] = Rotator(1, 1, 1, 1)
+qb = QuaternionArray(3)
+qa.mul(Quaternion(5, 6, 7, 8), qb)
+for n in range(3):
+    assert qb[n] == qa[n] * Quaternion(5, 6, 7, 8)
+qa.mul(qb, qb)
+for n in range(3):
+    assert qb[n] == qa[n] * (qa[n] * Quaternion(5, 6, 7, 8))
+qa.conjugate(qb)
+assert qb[0] == Quaternion(1, -2, -3, -4)
+qa.normalise(qb)
+for n in range(3):
+    assert qb[n].isrot()
+    assert qb[n] == qa[n] / abs(qa[n])
+pts = QuaternionArray(data=(0, 0, 1, 0, 0, 1, 0, 0, 0, 1, 2, 3))
+r = Rotator(pi/4, 0, 0, 1)
+out = QuaternionArray(len(pts))
+pts.rotate_points(r, out)
+for n in range(len(pts)):
+    assert out[n] == pts[n] @ r
+assert pts.rotate_points(r) is pts  # In place
+assert list(pts) == list(out)
+
+print('slerp() and Interpolator')
+q0 = Rotator(0.2, 1, 0, 0)
+q1 = Rotator(1.4, 1, 0, 0)
+assert slerp(q0, q1, 0) == q0 and slerp(q0, q1, 1) == q1
+assert slerp(q0, q1, 0.25) == Rotator(0.5, 1, 0, 0)
+assert slerp(q0, -q1, 0.25) == Rotator(0.5, 1, 0, 0)  # Shorter path
+q0 = Euler(0.3, -0.2, 0.1)
+q1 = Euler(-1, 0.5, 2)
+ip = Interpolator(q0, q1)
+for t in (0.1, 0.5, 0.9):  # Constant angular velocity
+    q = ip.at(t)
+    assert q.isrot()
+    assert isclose((q.conjugate() * q0).to_angle_axis()[0], t * ip.theta * 2, rel_tol=mdelta)
+q = Quaternion()
+assert ip.at(0.3, q) is q and q == ip.at(0.3)
+qa = ip.fill(QuaternionArray(5))
+assert qa[0] == q0 and qa[4] == q1 and qa[1] == ip.at(0.25)
+qa = ip.fill(QuaternionArray(3), 0.5, 1)
+assert qa[1] == ip.at(0.75)
+assert [x for x in ip.steps(5)] == list(ip.fill(QuaternionArray(5)))
+assert all(x is q for x in ip.steps(3, q)) and q == q1
+q1 = Rotator(0.205, 1, 0, 0)  # Small angle: nlerp
+ip = Interpolator(Rotator(0.2, 1, 0, 0), q1)
+assert ip.rs == 0
+assert ip.at(0.5).isrot() and ip.at(0.5) == Rotator(0.2025, 1, 0, 0)
+
+print('FastQuaternion')
+q1 = Quaternion(1, 2, 3, 4)
+q2 = Quaternion(5, 6, 7, 8)
+f1 = FastQuaternion(*q1)
+f2 = FastQuaternion(*q2)
+assert isinstance(f1.to_quaternion(), Quaternion) and f1.to_quaternion() == q1
+assert (f1.w, f1.x, f1.y, f1.z) == (1, 2, 3, 4)
+assert f1 * f2 == q1 * q2 and f1 * q2 == q1 * q2 and q1 * f2 == q1 * q2
+for other in (2, (2, 3, 4), (4, 5, 6, 7), q2, f2):
+    assert f1 * other == q1 * other
+    assert f1 + other == q1 + other
+    assert f1 - other == q1 - other
+    assert f1.copy().imul(other) == q1 * other
+    assert f1.copy().iadd(other) == q1 + other
+    assert q1.copy().imul(other) == q1 * other
+for op in ('conjugate', 'inverse', 'normalise', 'to_angle_axis', 'isrot', 'isvec', 'to_matrix'):
+    a = getattr(f1, op)()
+    b = getattr(q1, op)()
+    assert a == b if isinstance(a, (bool, FastQuaternion)) else all(isclose(x, y, rel_tol=mdelta) for x, y in zip(a, b))
+assert -f1 == -q1 and +f1 == q1 and +f1 is not f1
+assert abs(f1) == abs(q1) and len(f1) == 4 and str(f1) == str(q1)
+assert f1 / 2 == q1 / 2 and f1 < f2 and f2 > f1 and f1 >= f1.copy() and f1 != f2
+assert list(f1[1:]) == [2, 3, 4] and f1[0] == 1 and list(f1) == [1, 2, 3, 4]
+f = f1.copy()
+f[1:] = (9, 10, 11)
+f[0] = 8
+assert list(f) == [8, 9, 10, 11]
+p = FastQuaternion(*Vector(1, 2, 3))
+r = Rotator(1, 1, 1, 1)
+fr = FastQuaternion(*r)
+assert p @ fr == Vector(1, 2, 3) @ r and p.rrot(fr) == Vector(1, 2, 3).rrot(r)
+assert Vector(1, 2, 3) @ fr == Vector(1, 2, 3) @ r
+q = p.copy()
+q @= fr
+assert q == Vector(1, 2, 3) @ r
+q = Vector(1, 2, 3)
+q @= fr  # Quaternion rotated by FastQuaternion
+assert q == Vector(1, 2, 3) @ r
+assert f1.copy().normalise_inplace() == q1.normalise()
+assert euler(FastQuaternion(*Euler(0.1, 0.2, 0.3)))[2] == euler(Euler(0.1, 0.2, 0.3))[2]
+pts = array('f', (1, 2, 3))
+assert list(transform_points(fr, pts, array('f', pts))) == list(transform_points(r, pts, array('f', pts)))
+
 s = '''
 *** Standard tests PASSED. ***
 
@@ -192,6 +332,8 @@ assert 10 + Quaternion(1, 2, 3, 4) == Quaternion(11, 2, 3, 4)
 assert 1/q1 == q1.inverse()
 assert 2 * q1 == q1 + q1
 assert 1 - q1 == -q1 + 1
+assert 2 * FastQuaternion(*q1) == q1 + q1
+assert 1 - FastQuaternion(*q1) == -q1 + 1
 
 s = '''
 Reverse/reflected operators OK.
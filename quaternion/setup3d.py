@@ -11,6 +11,8 @@ import gc
 # fill(color)  Fill the buffer with a color
 # line(xs, ys, xe, ye, color)  Draw a line to the buffer
 # show() Display result
+# Optionally fill_rect(x, y, w, h, color) Fill a rectangle: enables
+# DisplayDict erase mode
 # Also dimension bound variable.
 
 from ssd1351_16bit import SSD1351 as SSD
@@ -48,6 +50,7 @@ _ssd = SSD(_spi, _pcs, _pdc, _prst, height=_HEIGHT)  # Create a display instance
 
 line = _ssd.line
 fill = _ssd.fill
+fill_rect = _ssd.fill_rect
 show = _ssd.show
 
 def setup():
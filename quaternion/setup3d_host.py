@@ -0,0 +1,105 @@
+# setup3d_host.py
+# Setup for 3D demos without display hardware, e.g. on a PC or the Unix build.
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) 2020 Peter Hinch
+
+# Renders into an RGB565 buffer in RAM. Uses framebuf where available (the Unix
+# build) otherwise a pure Python equivalent. To use, either copy to setup3d.py
+# or install it before importing graph3d:
+# import sys, setup3d_host
+# sys.modules['setup3d'] = setup3d_host
+# import graph3d
+
+_WIDTH = 128
+_HEIGHT = 128
+
+def rgb(r, g, b):  # RGB565
+    return ((r & 0xf8) << 8) | ((g & 0xfc) << 3) | (b >> 3)
+
+# Export color constants
+WHITE = rgb(255, 255, 255)
+GREY = rgb(100, 100, 100)
+GREEN = rgb(0, 255, 0)
+BLUE = rgb(0, 0, 255)
+RED = rgb(255, 0, 0)
+YELLOW = rgb(255, 255, 0)
+CYAN = rgb(0, 255, 255)
+BLACK = rgb(0, 0, 0)
+
+# DIMENSION No. of pixels for a change of 1.0
+# Viewing area is 128*128
+DIMENSION = 64
+
+# Subset of framebuf.FrameBuffer: RGB565 format, fill, fill_rect and line only.
+class FrameBuffer:
+    def __init__(self, buf, width, height):
+        self.buf = buf
+        self.width = width
+        self.height = height
+
+    def fill(self, c):
+        self.buf[:] = bytes((c & 0xff, c >> 8)) * (self.width * self.height)
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(x, 0)
+        x1 = min(x + w, self.width)
+        if x1 <= x0:
+            return
+        row = bytes((c & 0xff, c >> 8)) * (x1 - x0)
+        for y in range(max(y, 0), min(y + h, self.height)):
+            i = 2 * (y * self.width + x0)
+            self.buf[i : i + len(row)] = row
+
+    def pixel(self, x, y, c):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = 2 * (y * self.width + x)
+            self.buf[i] = c & 0xff
+            self.buf[i + 1] = c >> 8
+
+    def line(self, x0, y0, x1, y1, c):  # Bresenham
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x0, y0, c)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+buf = bytearray(_WIDTH * _HEIGHT * 2)  # 32KiB
+try:
+    import framebuf
+    _fb = framebuf.FrameBuffer(buf, _WIDTH, _HEIGHT, framebuf.RGB565)
+except ImportError:  # CPython
+    _fb = FrameBuffer(buf, _WIDTH, _HEIGHT)
+
+frames = 0  # Count of calls to show()
+
+# Standard functions
+line = _fb.line
+fill = _fb.fill
+fill_rect = _fb.fill_rect
+
+def show():
+    global frames
+    frames += 1
+
+def setup():
+    return _fb
+
+# Write the buffer to a binary PPM file for inspection.
+def save(fname):
+    with open(fname, 'wb') as f:
+        f.write('P6 {} {} 255\n'.format(_WIDTH, _HEIGHT).encode())
+        for i in range(0, len(buf), 2):
+            c = buf[i] | (buf[i + 1] << 8)
+            f.write(bytes(((c >> 8) & 0xf8, (c >> 3) & 0xfc, (c << 3) & 0xf8)))
@@ -40,6 +40,7 @@ _lcd.set_spi_win(0, 0, 160, 128)
 # Standard functions
 line = _fb.line
 fill = _fb.fill
+fill_rect = _fb.fill_rect
 
 def show():
     gc.collect()